@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 import os.path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +41,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # outermost, so queries of the other middleware are counted too
+    "polls.middleware.QueryInstrumentationMiddleware",
+    "polls.middleware.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -80,6 +83,164 @@ DATABASES = {
     }
 }
 
+# POLLS_DB_PROFILE "production" tunes SQLite for concurrent voters: WAL
+# journaling so readers don't block the writer, a busy timeout instead
+# of "database is locked" errors, a larger page cache and memory-mapped
+# reads, and connections kept open between requests. The pragmas are
+# run on every new connection by polls.signals.apply_sqlite_pragmas.
+POLLS_DB_PROFILE = config('POLLS_DB_PROFILE', cast=str, default='default')
+POLLS_SQLITE_PRODUCTION_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    # milliseconds a connection waits for the write lock
+    "busy_timeout": config('SQLITE_BUSY_TIMEOUT', cast=int, default=5000),
+    "mmap_size": config('SQLITE_MMAP_SIZE', cast=int, default=268435456),
+    # negative values are KiB, i.e. 64 MiB of page cache
+    "cache_size": config('SQLITE_CACHE_SIZE', cast=int, default=-65536),
+}
+# seconds a connection is reused for, like CONN_MAX_AGE
+POLLS_DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', cast=int, default=600)
+if POLLS_DB_PROFILE == 'production':
+    POLLS_SQLITE_PRAGMAS = POLLS_SQLITE_PRODUCTION_PRAGMAS
+    DATABASES["default"]["CONN_MAX_AGE"] = POLLS_DB_CONN_MAX_AGE
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+else:
+    POLLS_SQLITE_PRAGMAS = {}
+
+# POLLS_READ_REPLICAS lists database aliases the read-only views of
+# POLLS_REPLICA_VIEWS read polls models from, e.g. "replica" for a
+# replica.sqlite3 next to the primary, refreshed by "manage.py
+# sync_replicas". A user who wrote something keeps reading the primary
+# for POLLS_REPLICA_STICKY_SECONDS, so they see their own vote.
+POLLS_READ_REPLICAS = config('POLLS_READ_REPLICAS', cast=Csv(), default='')
+for alias in POLLS_READ_REPLICAS:
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "NAME": BASE_DIR / f"{alias}.sqlite3",
+        # tests read the primary test database through the replica alias
+        "TEST": {"MIRROR": "default"},
+    }
+POLLS_REPLICA_VIEWS = [
+    "polls:index",
+    "polls:questions_json",
+    "polls:results",
+    "polls:results_json",
+    "polls:export",
+]
+POLLS_REPLICA_STICKY_SECONDS = config(
+    'POLLS_REPLICA_STICKY_SECONDS', cast=int, default=30)
+DATABASE_ROUTERS = ["polls.routers.ReplicaRouter"]
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            'CACHE_BACKEND', cast=str,
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        "LOCATION": config('CACHE_LOCATION', cast=str, default='ku-polls'),
+    },
+    # queue of the write-behind vote buffer, entries must never be culled
+    "votes": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "ku-polls-votes",
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": 1000000},
+    },
+}
+
+# Sessions and messages
+# https://docs.djangoproject.com/en/4.1/topics/http/sessions/
+#
+# POLLS_SESSION_MODE "db" keeps Django's defaults. "cached_db" reads
+# sessions from the cache and only writes them through to the database,
+# "signed_cookies" keeps them in the browser (signed, not encrypted) and
+# never touches the database. Both low-overhead modes keep messages in
+# cookies only and never save sessions that a request didn't modify.
+POLLS_SESSION_MODE = config('POLLS_SESSION_MODE', cast=str, default='db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[POLLS_SESSION_MODE]
+SESSION_SAVE_EVERY_REQUEST = False
+if POLLS_SESSION_MODE != 'db':
+    MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Cache vote tallies of results pages, invalidated whenever a vote lands
+POLLS_RESULTS_CACHE = config('POLLS_RESULTS_CACHE', cast=bool, default=True)
+POLLS_RESULTS_CACHE_TIMEOUT = config(
+    'POLLS_RESULTS_CACHE_TIMEOUT', cast=int, default=300)
+
+# Queue votes and write them in batches instead of one write per request
+POLLS_VOTE_BUFFER = config('POLLS_VOTE_BUFFER', cast=bool, default=False)
+# most seconds a queued vote waits before it is written
+POLLS_VOTE_BUFFER_INTERVAL = config(
+    'POLLS_VOTE_BUFFER_INTERVAL', cast=float, default=1.0)
+# cache holding the queue, point it at a shared backend such as Redis
+# to drain it from any worker
+POLLS_VOTE_BUFFER_CACHE = config(
+    'POLLS_VOTE_BUFFER_CACHE', cast=str, default='votes')
+
+# Collapse identical vote submissions of a user within
+# POLLS_VOTE_DEDUP_SECONDS into one, and let each user vote
+# POLLS_VOTE_BURST times at once and POLLS_VOTE_RATE times per second
+# after that. State is kept per process, or in the cache named by
+# POLLS_VOTE_LIMITER_CACHE to share it between workers.
+POLLS_VOTE_LIMITER = config('POLLS_VOTE_LIMITER', cast=bool, default=False)
+POLLS_VOTE_DEDUP_SECONDS = config(
+    'POLLS_VOTE_DEDUP_SECONDS', cast=float, default=5.0)
+POLLS_VOTE_RATE = config('POLLS_VOTE_RATE', cast=float, default=1.0)
+POLLS_VOTE_BURST = config('POLLS_VOTE_BURST', cast=int, default=5)
+POLLS_VOTE_LIMITER_CACHE = config(
+    'POLLS_VOTE_LIMITER_CACHE', cast=str, default='')
+
+# Serve the question list and question form of anonymous index and
+# detail pages from rendered fragments, expired when questions change
+POLLS_FRAGMENT_CACHE = config('POLLS_FRAGMENT_CACHE', cast=bool,
+                              default=False)
+POLLS_FRAGMENT_CACHE_TIMEOUT = config(
+    'POLLS_FRAGMENT_CACHE_TIMEOUT', cast=int, default=300)
+
+# Seconds the panels of the admin analytics dashboard are cached for
+POLLS_ANALYTICS_CACHE_TIMEOUT = config(
+    'POLLS_ANALYTICS_CACHE_TIMEOUT', cast=int, default=60)
+
+# Route detail, results and vote to async views, mysite.asgi turns it on
+POLLS_ASYNC_VIEWS = config('POLLS_ASYNC_VIEWS', cast=bool, default=False)
+
+# Questions per index page, and the most a client can ask for with
+# ?page_size= on the index page and the questions API
+POLLS_PAGE_SIZE = config('POLLS_PAGE_SIZE', cast=int, default=5)
+POLLS_MAX_PAGE_SIZE = config('POLLS_MAX_PAGE_SIZE', cast=int, default=50)
+
+# Live results stream: least seconds between two updates to a viewer and
+# seconds of silence before a keep-alive comment
+POLLS_LIVE_RESULTS_INTERVAL = config(
+    'POLLS_LIVE_RESULTS_INTERVAL', cast=float, default=1.0)
+POLLS_LIVE_RESULTS_KEEPALIVE = config(
+    'POLLS_LIVE_RESULTS_KEEPALIVE', cast=float, default=15.0)
+
+# Count queries and database time of each request, log them on the
+# polls.queries logger and send them in a Server-Timing header
+POLLS_QUERY_INSTRUMENTATION = config(
+    'POLLS_QUERY_INSTRUMENTATION', cast=bool, default=False)
+# runs of one statement in a request that flag an N+1 query pattern
+POLLS_QUERY_REPEAT_THRESHOLD = config(
+    'POLLS_QUERY_REPEAT_THRESHOLD', cast=int, default=3)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "polls.queries": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
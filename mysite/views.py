@@ -12,10 +12,10 @@ def signup(request):
         if form.is_valid():
             form.save()
             username = form.cleaned_data.get('username')
-            raw_passwd = form.cleaned_data.get('password')
+            raw_passwd = form.cleaned_data.get('password1')
             user = authenticate(username=username, password=raw_passwd)
             login(request, user)
-        return redirect('polls')
+        return redirect('polls:index')
         # what if form is not valid?
         # we should display a message in signup.html
     else:
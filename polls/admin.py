@@ -1,13 +1,84 @@
 """This module contains ChoiceInline and QuestionAdmin."""
 
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.urls import path
+from django.utils import timezone
 
+from .analytics import dashboard, results_cache
 from .models import Choice, Question
 
 
+class StatusListFilter(admin.SimpleListFilter):
+    """Filter questions by voting state in the database."""
+
+    title = 'status'
+    parameter_name = 'status'
+
+    def lookups(self, request, model_admin):
+        """Offer the upcoming, open and closed states."""
+        return Question.Status.choices
+
+    def queryset(self, request, queryset):
+        """Keep the questions in the chosen state."""
+        if self.value() in Question.Status.values:
+            return getattr(queryset, self.value())(request.polls_now)
+        return queryset
+
+
+class RangeListFilter(admin.SimpleListFilter):
+    """Filter questions by ranges of a number, e.g. ``10-99`` or ``100-``.
+
+    Subclasses set ``field`` and the ``ranges`` offered as lookups.
+    """
+
+    field = None
+    ranges = ()
+
+    def lookups(self, request, model_admin):
+        """Offer the ranges of the filter."""
+        return self.ranges
+
+    def queryset(self, request, queryset):
+        """Keep the questions whose number is in the chosen range."""
+        if self.value() not in dict(self.ranges):
+            return queryset
+        low, dash, high = self.value().partition('-')
+        if not dash:
+            return queryset.filter(**{self.field: int(low)})
+        queryset = queryset.filter(**{f'{self.field}__gte': int(low)})
+        if high:
+            queryset = queryset.filter(**{f'{self.field}__lte': int(high)})
+        return queryset
+
+
+class VoteCountListFilter(RangeListFilter):
+    """Filter questions by their stored number of votes."""
+
+    title = 'total votes'
+    parameter_name = 'votes'
+    field = 'vote_count'
+    ranges = [('0', 'None'), ('1-9', '1 to 9'), ('10-99', '10 to 99'),
+              ('100-', '100 or more')]
+
+
+class ChoiceCountListFilter(RangeListFilter):
+    """Filter questions by their annotated number of choices."""
+
+    title = 'choices'
+    parameter_name = 'choices'
+    field = 'choice_count'
+    ranges = [('0', 'None'), ('1', 'One'), ('2-', 'Two or more')]
+
+
 class ChoiceInline(admin.TabularInline):
     model = Choice
     extra = 3
+    # stored counter, read with the choice rows instead of a COUNT each
+    readonly_fields = ['vote_count']
 
 
 class QuestionAdmin(admin.ModelAdmin):
@@ -19,9 +90,60 @@ class QuestionAdmin(admin.ModelAdmin):
     ]
     inlines = [ChoiceInline]
     list_display = ('question_text', 'pub_date',
-                    'was_published_recently', 'can_vote')
-    list_filter = ['pub_date', 'end_date']
+                    'was_published_recently', 'status', 'vote_count',
+                    'choice_count')
+    list_filter = [StatusListFilter, VoteCountListFilter,
+                   ChoiceCountListFilter, 'pub_date', 'end_date']
     search_fields = ['question_text']
+    # newest first on the (pub_date, id) index, without a second COUNT
+    ordering = ['-pub_date', '-id']
+    show_full_result_count = False
+    change_list_template = 'admin/polls/question/change_list.html'
+
+    def get_urls(self):
+        """Add the analytics dashboard next to the question pages."""
+        return [
+            path('analytics/', self.admin_site.admin_view(self.analytics),
+                 name='polls_question_analytics'),
+        ] + super().get_urls()
+
+    def analytics(self, request):
+        """Show participation, turnout and poll states of all questions."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        return TemplateResponse(request, 'admin/polls/analytics.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Polls analytics',
+            'opts': self.model._meta,
+            'panels': dashboard(),
+            'results_cache': results_cache(),
+        })
+
+    def get_queryset(self, request):
+        """Annotate questions with their voting state and choice count.
+
+        The state is computed at one ``now``. Choices are counted in a
+        correlated subquery, which only runs for the rows of the page,
+        where a JOIN and GROUP BY would count every question's choices.
+        The total votes are the stored counter of the question.
+        """
+        request.polls_now = timezone.now()
+        choice_count = Choice.objects.filter(
+            question=OuterRef('pk')).order_by().values(
+            'question').annotate(count=Count('pk')).values('count')
+        return super().get_queryset(request).with_status(
+            request.polls_now).annotate(choice_count=Coalesce(
+                Subquery(choice_count, output_field=IntegerField()), 0))
+
+    @admin.display(ordering='status', description='Status')
+    def status(self, question):
+        """Return the voting state annotated on the question."""
+        return Question.Status(question.status).label
+
+    @admin.display(ordering='choice_count', description='Choices')
+    def choice_count(self, question):
+        """Return the number of choices annotated on the question."""
+        return question.choice_count
 
 
 admin.site.register(Question, QuestionAdmin)
@@ -0,0 +1,120 @@
+"""This module contains the panels of the admin analytics dashboard.
+
+Every panel is one query, aggregated in the database or read from the
+stored vote counters, never a loop over questions, and the whole
+dashboard is cached for ``POLLS_ANALYTICS_CACHE_TIMEOUT`` seconds
+so refreshing the page doesn't run them again.
+"""
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
+
+from .models import Question, Vote
+from .tallies import cache_stats
+
+CACHE_KEY = 'polls:analytics'
+# questions listed in the participation and most active panels
+PANEL_SIZE = 10
+
+
+def status_counts(now):
+    """Return the number of upcoming, open and closed questions.
+
+    :param now: instant the states are computed at.
+
+    :returns: dict mapping every state to its number of questions.
+    """
+    counts = dict.fromkeys(Question.Status.values, 0)
+    counts.update(
+        Question.objects.with_status(now).order_by().values('status')
+        .annotate(count=Count('pk')).values_list('status', 'count'))
+    return counts
+
+
+def turnout():
+    """Return how many of the active users have voted at least once.
+
+    :returns: dict with ``users``, ``voters`` and their ``rate`` in %.
+    """
+    # EXISTS probes the (user, question) unique index once per user,
+    # where a JOIN would read every vote
+    totals = User.objects.filter(is_active=True).aggregate(
+        users=Count('pk'),
+        voters=Count('pk', filter=Exists(
+            Vote.objects.filter(user=OuterRef('pk')))))
+    totals['rate'] = _percent(totals['voters'], totals['users'])
+    return totals
+
+
+def participation(now, users):
+    """Return the open questions with the share of users who voted.
+
+    :param now: instant the open questions are found at.
+    :param users: number of active users, the turnout denominator.
+
+    :returns: list of dicts with ``id``, ``question_text``,
+        ``vote_count`` and ``rate`` in %, newest first.
+    """
+    rows = list(
+        Question.objects.open(now).order_by('-pub_date', '-id')
+        .values('id', 'question_text', 'vote_count')[:PANEL_SIZE])
+    for row in rows:
+        row['rate'] = _percent(row['vote_count'], users)
+    return rows
+
+
+def most_active(now):
+    """Return the questions with the most votes.
+
+    :param now: instant the states are computed at.
+
+    :returns: list of dicts with ``id``, ``question_text``,
+        ``vote_count`` and ``status``, most votes first.
+    """
+    return list(
+        Question.objects.with_status(now).filter(vote_count__gt=0)
+        .order_by('-vote_count', '-id')
+        .values('id', 'question_text', 'vote_count', 'status')
+        [:PANEL_SIZE])
+
+
+def _percent(part, whole):
+    """Return ``part`` as a percentage of ``whole``, rounded to 0.1."""
+    return round(100 * part / whole, 1) if whole else 0.0
+
+
+def results_cache():
+    """Return the hit rate of the results cache of this process.
+
+    It is read live, not cached with the other panels.
+
+    :returns: dict with ``hits``, ``misses`` and the ``rate`` of hits in
+        percent.
+    """
+    stats = cache_stats()
+    return {**stats, 'rate': _percent(
+        stats['hits'], stats['hits'] + stats['misses'])}
+
+
+def dashboard():
+    """Return the panels of the dashboard, cached for a short while.
+
+    :returns: dict with ``status``, ``turnout``, ``participation``,
+        ``most_active`` and the ``computed_at`` time.
+    """
+    panels = cache.get(CACHE_KEY)
+    if panels is None:
+        now = timezone.now()
+        totals = turnout()
+        panels = {
+            'status': status_counts(now),
+            'turnout': totals,
+            'participation': participation(now, totals['users']),
+            'most_active': most_active(now),
+            'computed_at': now,
+        }
+        cache.set(CACHE_KEY, panels, settings.POLLS_ANALYTICS_CACHE_TIMEOUT)
+    return panels
@@ -0,0 +1,174 @@
+"""This module contains async views of polls app for ASGI deployments.
+
+They mirror the detail, results and vote views of ``polls.views`` with
+Django's async ORM and are routed instead of them when
+``POLLS_ASYNC_VIEWS`` is on, as ``mysite.asgi`` sets it.
+"""
+
+from contextlib import asynccontextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse)
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from django.views import generic
+
+from . import fragments
+from .events import broker, live_results
+from .models import Choice, Question, Vote
+from .tallies import acast_vote, aget_tallies, closed_tallies
+from .views import limit_vote, queue_vote, refused, voted
+
+
+async def _request_user(request):
+    """Load the user of the request without blocking the event loop.
+
+    :returns: the authenticated user or AnonymousUser.
+    """
+    await sync_to_async(lambda: request.user.is_anonymous)()
+    return request.user
+
+
+@asynccontextmanager
+async def _forgotten_on_error(forget):
+    """Forget the vote submission if storing it raises.
+
+    :param forget: coroutine function forgetting the submission.
+    """
+    try:
+        yield
+    except Exception:
+        # not stored, so a retry must not be collapsed into it
+        await forget()
+        raise
+
+
+async def _choices(question):
+    """Return the choices of a question as a list for the templates."""
+    return [choice async for choice in question.choice_set.order_by('pk')]
+
+
+class AsyncDetailView(generic.View):
+    """Async view of the detail page."""
+
+    async def get(self, request, *args, **kwargs):
+        """Redirect to pages according to the status of question."""
+        user = await _request_user(request)
+        if await sync_to_async(fragments.enabled)(request):
+            html = await sync_to_async(fragments.get_fragment)(
+                'detail', kwargs['pk'])
+            if html is not None:
+                return render(request, 'polls/detail.html',
+                              {'question': Question(pk=kwargs['pk']),
+                               'choices_html': mark_safe(html)})
+        try:
+            question = await Question.objects.with_status().aget(
+                pk=kwargs['pk'])
+        except Question.DoesNotExist:
+            messages.error(request, 'No such question.')
+            return HttpResponseRedirect(reverse('polls:index'))
+        if question.status == Question.Status.UPCOMING:
+            messages.error(
+                request, 'That given question is not published yet.')
+            return HttpResponseRedirect(reverse('polls:index'))
+        if question.status == Question.Status.CLOSED:
+            messages.error(request, 'This question is closed.')
+            return HttpResponseRedirect(
+                reverse('polls:results', args=(question.id,)))
+        selected_choice_id = None
+        if not user.is_anonymous:
+            selected_choice_id = await Vote.objects.filter(
+                user=user, question=question
+            ).values_list('choice_id', flat=True).afirst()
+        context = {'question': question,
+                   'choices': await _choices(question),
+                   'selected_choice_id': selected_choice_id}
+        if await sync_to_async(fragments.enabled)(request):
+            context['choices_html'] = render_to_string(
+                'polls/_choices.html', context, request)
+            await sync_to_async(fragments.set_fragment)(
+                'detail', (question.pk,), context['choices_html'],
+                question.end_date)
+        return render(request, 'polls/detail.html', context)
+
+
+class AsyncResultsView(generic.View):
+    """Async view of the result page."""
+
+    async def get(self, request, *args, **kwargs):
+        """Render the tallies of a published question."""
+        now = timezone.now()
+        try:
+            question = await Question.objects.published(now).with_status(
+                now).select_related('snapshot').aget(pk=kwargs['pk'])
+        except Question.DoesNotExist:
+            raise Http404('No question found matching the query')
+        await _request_user(request)
+        choices = await sync_to_async(closed_tallies)(question)
+        if choices is None:
+            choices = await aget_tallies(question.pk)
+        return render(request, 'polls/results.html',
+                      {'question': question, 'choices': choices})
+
+
+async def vote(request, question_id):
+    """Create or update Vote object when vote occurs."""
+    user = await _request_user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    # the limiter's backends are sync, and may do network round trips
+    limited, forget = await sync_to_async(limit_vote)(
+        request, user.id, question_id)
+    forget = sync_to_async(forget)
+    if limited and limited.duplicate:
+        return voted(request, question_id, created=False)
+    choices = Choice.objects.select_related('question')
+    try:
+        selected_choice = None if limited else await choices.aget(
+            pk=request.POST['choice'], question=question_id)
+    except (KeyError, ValueError, Choice.DoesNotExist):
+        selected_choice = None
+    if selected_choice is None:
+        await forget()
+        try:
+            question = await Question.objects.aget(pk=question_id)
+        except Question.DoesNotExist:
+            raise Http404('No question found matching the query')
+        return refused(request, question, await _choices(question), limited)
+    async with _forgotten_on_error(forget):
+        if settings.POLLS_VOTE_BUFFER:
+            created = await sync_to_async(queue_vote)(
+                user.id, selected_choice.question_id, selected_choice.id)
+        else:
+            created = await acast_vote(user, selected_choice.question,
+                                       selected_choice.id) is None
+    return voted(request, selected_choice.question_id, created)
+
+
+async def results_stream(request, pk):
+    """Stream live tallies of a published question as Server-Sent Events.
+
+    Only served by the ASGI application, a WSGI worker would be held by
+    each viewer for as long as the stream stays open.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse('Live results are served under ASGI only.',
+                            status=501)
+    if not broker.watching(pk):
+        published = await Question.objects.published().filter(
+            pk=pk).aexists()
+        if not published:
+            raise Http404('No question found matching the query')
+    response = StreamingHttpResponse(
+        live_results(pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
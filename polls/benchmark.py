@@ -0,0 +1,209 @@
+"""This module contains helpers shared by the benchmark commands."""
+
+import datetime
+import importlib
+import random
+import re
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, teardown_databases)
+from django.urls import clear_url_caches
+from django.utils import timezone
+
+from .fragments import invalidate_fragments
+from .models import Choice, Question, Vote
+from .tallies import rebuild_vote_counts
+
+WRITE = re.compile(r'\s*(INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+
+@contextmanager
+def isolated_database(name=None):
+    """Run the block against a throwaway test database.
+
+    Benchmarks seed and write a lot of rows, so they never touch the
+    project's real database.
+
+    :param name: database name to use instead of the test default, e.g.
+        a file path so concurrent SQLite connections wait for each other
+        instead of failing on the shared in-memory database.
+    """
+    test_settings = connection.settings_dict['TEST']
+    default_name = test_settings.get('NAME')
+    if name:
+        test_settings['NAME'] = name
+    # inside a test run, the in-memory test database lives as long as its
+    # connection, which is put aside while the block uses another one
+    memory = connection.connection if connection.is_in_memory_db() else None
+    if memory is not None:
+        connection.connection = None
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        # the test clients send requests to the "testserver" host
+        with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        test_settings['NAME'] = default_name
+        if memory is not None:
+            connection.connection = memory
+
+
+@contextmanager
+def use_async_views(enabled=True):
+    """Route the polls pages to the async or the sync views in the block.
+
+    :param enabled: True for the ASGI views of ``polls.async_views``.
+    """
+    def reload_urls():
+        for name in ('polls.urls', settings.ROOT_URLCONF):
+            importlib.reload(importlib.import_module(name))
+        clear_url_caches()
+
+    try:
+        with override_settings(POLLS_ASYNC_VIEWS=enabled):
+            reload_urls()
+            yield
+    finally:
+        reload_urls()
+
+
+def seed_dataset(questions=10, choices=4, users=100, votes=0, seed=65):
+    """Create published questions, choices, users and random votes.
+
+    :param questions: number of open questions.
+    :param choices: number of choices of each question.
+    :param users: number of users, all with password ``benchpass``.
+    :param votes: number of votes, at most one per user and question.
+    :param seed: seed of the random generator picking votes.
+
+    :returns: dict with lists of created ``questions``, ``choices``
+        (per question) and ``users``.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    created_questions = Question.objects.bulk_create([
+        Question(question_text=f'Benchmark question {number}',
+                 pub_date=now - datetime.timedelta(minutes=number + 1),
+                 end_date=now + datetime.timedelta(days=30))
+        for number in range(questions)])
+    created_choices = Choice.objects.bulk_create([
+        Choice(question=question, choice_text=f'Choice {number}')
+        for question in created_questions for number in range(choices)])
+    choices_of = {}
+    for choice in created_choices:
+        choices_of.setdefault(choice.question_id, []).append(choice)
+    password = make_password('benchpass')
+    created_users = User.objects.bulk_create([
+        User(username=f'bench{number}', password=password)
+        for number in range(users)])
+    pairs = [(user, question) for user in created_users
+             for question in created_questions]
+    Vote.objects.bulk_create([
+        Vote(user=user, question=question,
+             choice=rng.choice(choices_of[question.pk]))
+        for user, question in rng.sample(pairs, min(votes, len(pairs)))
+    ], batch_size=1000)
+    rebuild_vote_counts()
+    invalidate_fragments()
+    return {'questions': created_questions,
+            'choices': choices_of,
+            'users': created_users}
+
+
+def summarize(latencies, seconds):
+    """Summarize request latencies of one benchmark run.
+
+    :param latencies: seconds taken by each request.
+    :param seconds: wall clock seconds of the whole run.
+
+    :returns: dict with request count, throughput and latency
+        percentiles in milliseconds.
+    """
+    ordered = sorted(latencies)
+
+    def percentile(fraction):
+        index = min(len(ordered) - 1, int(fraction * len(ordered)))
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        'requests': len(ordered),
+        'seconds': round(seconds, 4),
+        'per_second': round(len(ordered) / seconds, 1) if seconds else 0.0,
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+    }
+
+
+def measure(send, requests):
+    """Send requests one after the other and time them.
+
+    :param send: callable taking the request number and returning the
+        response; database queries must run in the calling thread.
+    :param requests: number of requests to send.
+
+    :returns: summary of the run with the mean and highest number of
+        queries per request, the mean number of INSERT, UPDATE and
+        DELETE statements and the count of each status code.
+    """
+    latencies, queries, writes, statuses = [], [], [], {}
+    started = time.perf_counter()
+    for number in range(requests):
+        with CaptureQueriesContext(connection) as captured:
+            begin = time.perf_counter()
+            response = send(number)
+            latencies.append(time.perf_counter() - begin)
+        queries.append(len(captured))
+        writes.append(sum(1 for query in captured
+                          if WRITE.match(query['sql'])))
+        status = str(response.status_code)
+        statuses[status] = statuses.get(status, 0) + 1
+    summary = summarize(latencies, time.perf_counter() - started)
+    summary['queries'] = round(statistics.fmean(queries), 2)
+    summary['max_queries'] = max(queries)
+    summary['writes'] = round(statistics.fmean(writes), 2)
+    summary['statuses'] = statuses
+    return summary
+
+
+def compare_runs(baseline, current, tolerance=0.1):
+    """List the regressions of a benchmark run against a baseline run.
+
+    A path regresses when its throughput drops or its p95 latency grows
+    by more than ``tolerance``, or when it makes more queries per request.
+
+    :param baseline: saved result of an earlier run.
+    :param current: result of this run.
+    :param tolerance: fraction of timing noise allowed.
+
+    :returns: list of messages, empty when nothing regressed.
+    """
+    regressions = []
+    for path, after in current['paths'].items():
+        before = baseline.get('paths', {}).get(path)
+        if before is None:
+            continue
+        if after['per_second'] < before['per_second'] * (1 - tolerance):
+            regressions.append(
+                f"{path}: {after['per_second']} requests/s, "
+                f"was {before['per_second']}")
+        if after['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f"{path}: p95 {after['p95_ms']} ms, "
+                f"was {before['p95_ms']}")
+        if after['queries'] > before['queries']:
+            regressions.append(
+                f"{path}: {after['queries']} queries/request, "
+                f"was {before['queries']}")
+    return regressions
@@ -0,0 +1,242 @@
+"""This module contains the write-behind buffer for incoming votes.
+
+When ``POLLS_VOTE_BUFFER`` is on, the vote view only queues the vote and
+a background thread writes queued votes in batches, so concurrent voters
+no longer take SQLite's write lock one request at a time.
+"""
+
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+
+from .models import Choice, Vote
+from .tallies import apply_vote_deltas
+
+logger = logging.getLogger(__name__)
+
+SEQUENCE_KEY = 'polls:buffer:seq'
+HEAD_KEY = 'polls:buffer:head'
+LOCK_KEY = 'polls:buffer:lock'
+
+
+def _item_key(seq):
+    """Return the cache key of a queued vote."""
+    return f'polls:buffer:item:{seq}'
+
+
+def _writable(latest):
+    """Drop the queued votes that can no longer be written.
+
+    Their voter or choice was deleted while they were queued, and one of
+    them would make the database reject the whole batch.
+
+    :param latest: dict mapping ``(user_id, question_id)`` to choice id.
+
+    :returns: dict of the votes to write.
+    """
+    users = set(User.objects.filter(
+        pk__in={user_id for user_id, _ in latest}
+    ).values_list('pk', flat=True))
+    choices = dict(Choice.objects.filter(
+        pk__in=set(latest.values())).values_list('pk', 'question'))
+    writable = {}
+    for (user_id, question_id), choice_id in latest.items():
+        if user_id in users and choices.get(choice_id) == question_id:
+            writable[(user_id, question_id)] = choice_id
+        else:
+            logger.warning(
+                'Dropped queued vote of user %s for choice %s of question '
+                '%s, one of them no longer exists.',
+                user_id, choice_id, question_id)
+    return writable
+
+
+def write_votes(latest):
+    """Write the latest choice of each (user, question) in one transaction.
+
+    Votes whose voter or choice no longer exists are logged and dropped.
+
+    :param latest: dict mapping ``(user_id, question_id)`` to choice id.
+
+    :returns: number of votes created or changed.
+    """
+    if not latest:
+        return 0
+    deltas = defaultdict(lambda: defaultdict(int))
+    with transaction.atomic():
+        latest = _writable(latest)
+        user_ids = {user_id for user_id, _ in latest}
+        question_ids = {question_id for _, question_id in latest}
+        existing = {}
+        rows = Vote.objects.filter(
+            user__in=user_ids, question__in=question_ids
+        ).values_list('pk', 'user', 'question', 'choice')
+        for pk, user_id, question_id, choice_id in rows:
+            existing[(user_id, question_id)] = Vote(
+                pk=pk, choice_id=choice_id)
+        new_votes, moved_votes = [], []
+        for (user_id, question_id), choice_id in latest.items():
+            vote = existing.get((user_id, question_id))
+            if vote is None:
+                new_votes.append(Vote(user_id=user_id,
+                                      question_id=question_id,
+                                      choice_id=choice_id))
+            elif vote.choice_id != choice_id:
+                deltas[question_id][vote.choice_id] -= 1
+                vote.choice_id = choice_id
+                moved_votes.append(vote)
+            else:
+                continue
+            deltas[question_id][choice_id] += 1
+        Vote.objects.bulk_create(new_votes, batch_size=500)
+        Vote.objects.bulk_update(moved_votes, ['choice'], batch_size=500)
+        apply_vote_deltas(
+            {pk: dict(choices) for pk, choices in deltas.items()})
+    return len(new_votes) + len(moved_votes)
+
+
+class VoteBuffer:
+    """Queue of pending votes with last-write-wins per (user, question).
+
+    Votes are kept in a cache, so the queue lives in the process with the
+    local-memory backend and is shared by every worker (and the
+    ``flush_votes`` command) with a shared backend such as Redis.
+    """
+
+    def __init__(self, alias='votes', interval=1.0, batch_size=1000):
+        """Create a buffer on a cache alias.
+
+        :param alias: name of the cache in ``CACHES`` holding the queue.
+        :param interval: most seconds a queued vote waits to be written.
+        :param batch_size: number of queued votes read per cache call.
+        """
+        self.alias = alias
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stalled = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    @property
+    def cache(self):
+        """Return the cache holding the queue."""
+        return caches[self.alias]
+
+    def push(self, user_id, question_id, choice_id):
+        """Queue a vote and make sure it gets flushed in time.
+
+        :param user_id: id of the voter.
+        :param question_id: id of the question voted on.
+        :param choice_id: id of the selected choice.
+        """
+        self.cache.add(SEQUENCE_KEY, 0, None)
+        seq = self.cache.incr(SEQUENCE_KEY)
+        self.cache.set(
+            _item_key(seq), (user_id, question_id, choice_id), None)
+        self.start()
+
+    def pending(self):
+        """Return the number of queued votes not yet flushed."""
+        return (self.cache.get(SEQUENCE_KEY, 0)
+                - self.cache.get(HEAD_KEY, 0))
+
+    def flush(self):
+        """Write every queued vote to the database.
+
+        Only one flusher at a time drains the queue; a concurrent call
+        returns without writing.
+
+        :returns: number of votes created or changed.
+        """
+        if not self.cache.add(LOCK_KEY, True, 60):
+            return 0
+        try:
+            return self._drain()
+        finally:
+            self.cache.delete(LOCK_KEY)
+
+    def _queued(self, head, tail):
+        """Yield ``(seq, vote)`` of queued votes, vote is None if missing."""
+        for start in range(head + 1, tail + 1, self.batch_size):
+            seqs = range(start, min(start + self.batch_size, tail + 1))
+            items = self.cache.get_many([_item_key(seq) for seq in seqs])
+            for seq in seqs:
+                yield seq, items.get(_item_key(seq))
+
+    def _drain(self):
+        """Read queued votes in order and write the latest of each."""
+        head = self.cache.get(HEAD_KEY, 0)
+        tail = self.cache.get(SEQUENCE_KEY, 0)
+        latest = {}
+        done = head
+        for seq, item in self._queued(head, tail):
+            if item is None:
+                if self._stalled != seq:
+                    # pushed but not stored yet, retry it on the next flush
+                    self._stalled = seq
+                    break
+                logger.warning('Dropped missing queued vote %s.', seq)
+            else:
+                user_id, question_id, choice_id = item
+                latest[(user_id, question_id)] = choice_id
+            done = seq
+        written = write_votes(latest)
+        self.cache.set(HEAD_KEY, done, None)
+        self.cache.delete_many(
+            [_item_key(seq) for seq in range(head + 1, done + 1)])
+        return written
+
+    def start(self):
+        """Start the background flusher of this process if needed."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._wakeup.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name='polls-vote-buffer', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Stop the background flusher and write what is still queued."""
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _run(self):
+        """Flush the queue every ``interval`` seconds until stopped."""
+        while not self._wakeup.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Flushing queued votes failed.')
+            finally:
+                close_old_connections()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_vote_buffer():
+    """Return the vote buffer of this process.
+
+    :returns: VoteBuffer configured from the ``POLLS_VOTE_BUFFER_*``
+        settings.
+    """
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = VoteBuffer(
+                alias=settings.POLLS_VOTE_BUFFER_CACHE,
+                interval=settings.POLLS_VOTE_BUFFER_INTERVAL)
+            atexit.register(_buffer.stop)
+        return _buffer
@@ -0,0 +1,153 @@
+"""This module contains the in-process pub/sub of live poll results.
+
+Each question with viewers keeps one copy of its tallies here, updated
+from the ``tallies_changed`` signal, so connected viewers never query
+the database; each of them is woken up when the tallies change and sends
+what changed at most once per ``POLLS_LIVE_RESULTS_INTERVAL``.
+"""
+
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.dispatch import receiver
+
+from .tallies import aget_tallies, tallies_changed
+
+
+class Subscription:
+    """One viewer of the live results of a question."""
+
+    def __init__(self, question_id):
+        """Create a subscription bound to the running event loop."""
+        self.question_id = question_id
+        self.loop = asyncio.get_running_loop()
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        """Wake the viewer up, from any thread."""
+        self.loop.call_soon_threadsafe(self.changed.set)
+
+
+class TallyBroker:
+    """Keep the tallies of watched questions and notify their viewers."""
+
+    def __init__(self):
+        """Create an empty broker."""
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._tallies = {}
+
+    def watching(self, question_id):
+        """Return True if the question already has viewers."""
+        with self._lock:
+            return question_id in self._subscriptions
+
+    async def subscribe(self, question_id):
+        """Add a viewer, loading the question's tallies for the first one.
+
+        :returns: Subscription of the new viewer.
+        """
+        subscription = Subscription(question_id)
+        with self._lock:
+            self._subscriptions.setdefault(question_id, set()).add(
+                subscription)
+        await self.tallies(question_id)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a viewer and forget tallies nobody is watching."""
+        with self._lock:
+            viewers = self._subscriptions.get(subscription.question_id, set())
+            viewers.discard(subscription)
+            if not viewers:
+                self._subscriptions.pop(subscription.question_id, None)
+                self._tallies.pop(subscription.question_id, None)
+
+    async def tallies(self, question_id):
+        """Return ``{choice_id: votes}`` of a watched question.
+
+        Tallies are read from the results cache or database only when the
+        broker has none, i.e. for the first viewer or after a reload.
+        """
+        with self._lock:
+            current = self._tallies.get(question_id)
+        if current is None:
+            current = {
+                row['id']: row['votes']
+                for row in await aget_tallies(question_id)}
+            with self._lock:
+                if question_id in self._subscriptions:
+                    self._tallies.setdefault(question_id, current)
+                    current = self._tallies[question_id]
+        return dict(current)
+
+    def publish(self, question_id, deltas):
+        """Apply vote changes of a question and wake its viewers.
+
+        :param question_id: id of the question.
+        :param deltas: dict of choice id to vote change, or None to read
+            the tallies again.
+        """
+        with self._lock:
+            viewers = list(self._subscriptions.get(question_id, ()))
+            if not viewers:
+                return
+            current = self._tallies.get(question_id)
+            if deltas is None:
+                self._tallies.pop(question_id, None)
+            elif current is not None:
+                for choice_id, delta in deltas.items():
+                    current[choice_id] = current.get(choice_id, 0) + delta
+        for subscription in viewers:
+            subscription.notify()
+
+
+broker = TallyBroker()
+
+
+@receiver(tallies_changed)
+def publish_tallies(sender, question_id, deltas, **kwargs):
+    """Forward tally changes to the live results viewers."""
+    broker.publish(question_id, deltas)
+
+
+def _event(name, data):
+    """Format one Server-Sent Event."""
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'
+
+
+async def live_results(question_id):
+    """Yield Server-Sent Events with the tallies of a question.
+
+    The first event holds every choice, the following ones only the
+    choices whose count changed since the previous event, or null for
+    deleted choices.
+    """
+    subscription = await broker.subscribe(question_id)
+    try:
+        sent = await broker.tallies(question_id)
+        yield _event('tallies', sent)
+        while True:
+            try:
+                await asyncio.wait_for(
+                    subscription.changed.wait(),
+                    settings.POLLS_LIVE_RESULTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            subscription.changed.clear()
+            current = await broker.tallies(question_id)
+            changed = {
+                choice_id: votes for choice_id, votes in current.items()
+                if sent.get(choice_id) != votes}
+            # choices deleted from the question are sent as null
+            changed.update(dict.fromkeys(sent.keys() - current.keys()))
+            if changed:
+                sent = current
+                yield _event('delta', changed)
+            # coalesce every change of the next interval into one event
+            await asyncio.sleep(settings.POLLS_LIVE_RESULTS_INTERVAL)
+    finally:
+        broker.unsubscribe(subscription)
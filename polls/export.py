@@ -0,0 +1,94 @@
+"""This module contains the streaming CSV and JSONL export of poll data.
+
+Rows are read with ``.iterator()`` and encoded one at a time, so memory
+use stays flat however many votes there are. Under ASGI the chunks are
+handed over through ``stream_async``, as Django reads a sync iterator
+whole before sending any of it.
+"""
+
+import csv
+import json
+import zlib
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from .models import Choice, Vote
+
+EXPORTS = {
+    'tallies': (
+        ('question_id', 'question_text', 'choice_id', 'choice_text',
+         'votes'),
+        lambda: Choice.objects.order_by('question', 'pk').values_list(
+            'question', 'question__question_text', 'pk', 'choice_text',
+            'vote_count')),
+    'votes': (
+        ('user_id', 'question_id', 'choice_id'),
+        lambda: Vote.objects.order_by('pk').values_list(
+            'user', 'question', 'choice')),
+}
+FORMATS = ('csv', 'jsonl')
+
+
+class _Echo:
+    """File-like object whose ``write`` returns what it is given."""
+
+    def write(self, value):
+        """Return the value instead of storing it."""
+        return value
+
+
+def export_lines(kind, fmt, chunk_size=2000):
+    """Yield the lines of an export as text.
+
+    :param kind: ``tallies`` or ``votes``.
+    :param fmt: ``csv`` or ``jsonl``.
+    :param chunk_size: rows fetched from the database at a time.
+    """
+    header, queryset = EXPORTS[kind]
+    rows = queryset().iterator(chunk_size=chunk_size)
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(header, row))) + '\n'
+
+
+def encode(lines, compress=False, flush_every=512):
+    """Encode text lines to UTF-8 bytes, gzipped on the fly if asked.
+
+    :param lines: iterable of text lines.
+    :param compress: gzip the output.
+    :param flush_every: lines buffered before compressed bytes are sent.
+    """
+    if not compress:
+        for line in lines:
+            yield line.encode('utf-8')
+        return
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    pending = []
+    for line in lines:
+        pending.append(compressor.compress(line.encode('utf-8')))
+        if len(pending) >= flush_every:
+            yield b''.join(pending) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = []
+    yield b''.join(pending) + compressor.flush()
+
+
+async def stream_async(chunks, batch_size=512):
+    """Yield the chunks of a sync iterator from the event loop.
+
+    The iterator runs in the thread of the sync views, which holds its
+    database connection, a batch of chunks at a time.
+
+    :param chunks: iterable of bytes.
+    :param batch_size: chunks pulled per trip to the thread.
+    """
+    iterator = iter(chunks)
+    take = sync_to_async(lambda: list(islice(iterator, batch_size)))
+    while batch := await take():
+        for chunk in batch:
+            yield chunk
@@ -0,0 +1,101 @@
+"""This module contains the rendered-fragment cache of anonymous pages.
+
+When ``POLLS_FRAGMENT_CACHE`` is on, the question list of the index page
+and the question form of the detail page are rendered once for
+anonymous visitors and kept in the cache. Only the parts that are the
+same for every anonymous visitor are cached: messages, the CSRF token
+and the login links are rendered on every request around them.
+
+Keys carry a version that is replaced whenever a question or choice is
+saved or deleted, and every entry also remembers the moment the next
+question gets published or closed, after which it is ignored.
+"""
+
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Question
+from .routers import reading_replica
+
+VERSION_KEY = 'polls:fragments:version'
+
+
+def enabled(request):
+    """Return True if the request can be served from the cache."""
+    return (settings.POLLS_FRAGMENT_CACHE and request.method == 'GET'
+            and request.user.is_anonymous)
+
+
+def _version():
+    """Return the current version of the fragment keys."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def _key(name, parts):
+    """Return the cache key of a fragment at the current version."""
+    return ':'.join(['polls:fragment', _version(), name,
+                     *(str(part) for part in parts)])
+
+
+def get_fragment(name, *parts):
+    """Return a cached fragment, or None if missing or expired.
+
+    :param name: ``index`` or ``detail``.
+    :param parts: values the fragment depends on, e.g. the page cursor.
+    """
+    entry = cache.get(_key(name, parts))
+    if entry is None:
+        return None
+    html, valid_until = entry
+    if valid_until is not None and timezone.now() >= valid_until:
+        return None
+    return html
+
+
+def set_fragment(name, parts, html, valid_until=None):
+    """Cache a rendered fragment, unless it was read from a replica.
+
+    :param name: ``index`` or ``detail``.
+    :param parts: values the fragment depends on.
+    :param html: rendered fragment.
+    :param valid_until: moment the fragment goes stale on its own, when
+        a question gets published or closed, or None.
+    """
+    if reading_replica():
+        return
+    timeout = settings.POLLS_FRAGMENT_CACHE_TIMEOUT
+    if valid_until is not None:
+        seconds = (valid_until - timezone.now()).total_seconds()
+        if seconds <= 0:
+            return
+        timeout = min(timeout, int(seconds) + 1)
+    cache.set(_key(name, parts), (html, valid_until), timeout)
+
+
+def next_transition(now=None):
+    """Return when the next question gets published or closed.
+
+    :returns: datetime, or None if no question will change state.
+    """
+    now = now or timezone.now()
+    moments = [
+        Question.objects.upcoming(now).order_by('pub_date').values_list(
+            'pub_date', flat=True).first(),
+        Question.objects.filter(end_date__gte=now).order_by(
+            'end_date').values_list('end_date', flat=True).first(),
+    ]
+    moments = [moment for moment in moments if moment is not None]
+    return min(moments) if moments else None
+
+
+def invalidate_fragments():
+    """Expire every cached fragment by moving to a new key version."""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
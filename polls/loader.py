@@ -0,0 +1,184 @@
+"""This module contains the streaming bulk loader for fixture files.
+
+It reads the same format as ``loaddata`` (a JSON array of objects with
+``model``, ``pk`` and ``fields``, or one such object per line in a
+``.jsonl`` file) without holding the whole file in memory.
+"""
+
+import json
+import re
+from collections import defaultdict
+
+from django.apps import apps
+from django.db import connection, transaction
+
+from .fragments import invalidate_fragments
+from .models import Question, Vote
+from .tallies import rebuild_vote_counts
+
+_SKIP = re.compile(r'[\s,]*')
+
+
+def iter_json_array(stream, chunk_size=65536):
+    """Yield the items of a JSON array read from a text stream.
+
+    :param stream: text stream containing one JSON array of objects.
+    :param chunk_size: number of characters read at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer = stream.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Fixture is not a JSON array.')
+    position = 1
+    eof = False
+    while True:
+        position = _SKIP.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+def iter_json_lines(stream):
+    """Yield one JSON object per non-empty line of a text stream."""
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_fixture(path):
+    """Yield the objects of a ``.json`` or ``.jsonl`` fixture file.
+
+    :param path: path of the fixture file.
+    """
+    with open(path, encoding='utf-8') as stream:
+        if str(path).endswith('.jsonl'):
+            yield from iter_json_lines(stream)
+        else:
+            yield from iter_json_array(stream)
+
+
+class BulkLoader:
+    """Insert fixture objects with ``bulk_create`` in batches.
+
+    Objects get new primary keys unless ``keep_pks`` is set; foreign keys
+    are then translated through an in-memory map from fixture pk to
+    database pk, so they must point to objects loaded earlier. With
+    ``keep_pks`` they are used as is.
+    """
+
+    def __init__(self, batch_size=1000, keep_pks=False):
+        """Create a loader.
+
+        :param batch_size: objects inserted per ``bulk_create``.
+        :param keep_pks: insert objects with the pks of the fixture.
+        """
+        if not keep_pks and \
+                not connection.features.can_return_rows_from_bulk_insert:
+            raise ValueError('This database cannot return new primary keys '
+                             'from bulk inserts, load with keep_pks.')
+        self.batch_size = batch_size
+        self.keep_pks = keep_pks
+        self.pk_map = defaultdict(dict)
+        self.pending = defaultdict(list)
+        self.counts = defaultdict(int)
+        self.question_ids = set()
+
+    def add(self, item):
+        """Queue one fixture object, flushing batches as they fill up.
+
+        :param item: dict with ``model``, ``pk`` and ``fields``.
+        """
+        model = apps.get_model(item['model'])
+        instance = model(pk=item.get('pk') if self.keep_pks else None)
+        many_to_many = {}
+        for name, value in item['fields'].items():
+            field = model._meta.get_field(name)
+            if field.many_to_many:
+                many_to_many[field] = value
+            elif field.many_to_one or field.one_to_one:
+                setattr(instance, field.attname,
+                        self.resolve(field.related_model, value))
+            else:
+                setattr(instance, field.attname, field.to_python(value))
+        self.pending[model].append((item.get('pk'), instance, many_to_many))
+        if len(self.pending[model]) >= self.batch_size:
+            self.flush(model)
+
+    def resolve(self, model, pk):
+        """Return the database pk of a fixture pk of ``model``.
+
+        :raises LookupError: if new pks are given and the object was not
+            loaded before.
+        """
+        if pk is None:
+            return None
+        if pk not in self.pk_map[model] and self.pending[model]:
+            # the parent may still be waiting in its batch
+            self.flush(model)
+        if self.keep_pks:
+            return pk
+        try:
+            return self.pk_map[model][pk]
+        except KeyError:
+            raise LookupError(
+                f'{model._meta.label} {pk!r} is not loaded before the '
+                'objects pointing to it; load it first, or keep the pks of '
+                'the fixture.') from None
+
+    def flush(self, model=None):
+        """Insert the queued objects of one model, or of every model."""
+        for batch_model in [model] if model else list(self.pending):
+            batch = self.pending.pop(batch_model, [])
+            if not batch:
+                continue
+            with transaction.atomic():
+                batch_model.objects.bulk_create(
+                    [instance for _, instance, _ in batch])
+                self.add_many_to_many(batch)
+            for fixture_pk, instance, _ in batch:
+                if fixture_pk is not None:
+                    self.pk_map[batch_model][fixture_pk] = instance.pk
+            self.counts[batch_model._meta.label] += len(batch)
+            if batch_model is Vote:
+                self.question_ids.update(
+                    instance.question_id for _, instance, _ in batch)
+
+    def add_many_to_many(self, batch):
+        """Insert the many-to-many rows of freshly inserted objects."""
+        rows = defaultdict(list)
+        for _, instance, many_to_many in batch:
+            for field, values in many_to_many.items():
+                through = field.remote_field.through
+                source = field.m2m_field_name()
+                target = field.m2m_reverse_field_name()
+                rows[through].extend(
+                    through(**{f'{source}_id': instance.pk,
+                               f'{target}_id': self.resolve(
+                                   field.related_model, value)})
+                    for value in values)
+        for through, objects in rows.items():
+            through.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def finish(self):
+        """Flush what is left, recount the loaded votes and expire pages.
+
+        :returns: dict of inserted rows per model label.
+        """
+        self.flush()
+        question_ids = sorted(self.question_ids)
+        for start in range(0, len(question_ids), self.batch_size):
+            rebuild_vote_counts(Question.objects.filter(
+                pk__in=question_ids[start:start + self.batch_size]))
+        # bulk inserts send no post_save to expire cached pages
+        transaction.on_commit(invalidate_fragments)
+        return dict(self.counts)
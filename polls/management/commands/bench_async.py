@@ -0,0 +1,118 @@
+"""This module contains command to benchmark the sync and async views."""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from polls.benchmark import (
+    isolated_database, seed_dataset, summarize, use_async_views)
+
+
+class Command(BaseCommand):
+    """Compare the sync and async stacks under a burst of voters."""
+
+    help = ('Let a burst of logged-in voters open the detail page, vote '
+            'and read the results, once through the sync views on a '
+            'thread pool and once through the async views on one event '
+            'loop, and report requests/sec and latency percentiles.')
+
+    def add_arguments(self, parser):
+        """Add the size of the burst."""
+        parser.add_argument('--voters', type=int, default=200,
+                            help='Number of voters in the burst.')
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help='Voters in flight at the same time.')
+        parser.add_argument('--choices', type=int, default=4,
+                            help='Number of choices of the question.')
+
+    def handle(self, *args, **options):
+        """Run the burst on both stacks and print summaries as JSON."""
+        voters = options['voters']
+        concurrency = options['concurrency']
+        with tempfile.TemporaryDirectory() as directory, \
+                isolated_database(os.path.join(directory, 'bench.sqlite3')):
+            dataset = seed_dataset(
+                questions=2, choices=options['choices'], users=voters)
+            sync_question, async_question = dataset['questions']
+            with use_async_views(False):
+                results = {'sync': self.run_sync(
+                    dataset, sync_question, concurrency)}
+            with use_async_views(True):
+                results['async'] = self.run_async(
+                    dataset, async_question, concurrency)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    @staticmethod
+    def flow(question, choices, number):
+        """Return the requests one voter makes as (method, url, data)."""
+        choice = choices[number % len(choices)]
+        return [
+            ('get', reverse('polls:detail', args=(question.pk,)), None),
+            ('post', reverse('polls:vote', args=(question.pk,)),
+             {'choice': choice.pk}),
+            ('get', reverse('polls:results', args=(question.pk,)), None),
+        ]
+
+    def run_sync(self, dataset, question, concurrency):
+        """Run the burst through the sync views on a thread pool."""
+        choices = dataset['choices'][question.pk]
+        clients = []
+        for user in dataset['users']:
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            clients.append(client)
+        latencies, errors = [], []
+
+        def voter(number):
+            for method, url, data in self.flow(question, choices, number):
+                begin = time.perf_counter()
+                response = getattr(clients[number], method)(url, data)
+                latencies.append(time.perf_counter() - begin)
+                if response.status_code >= 500:
+                    errors.append(response.status_code)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(voter, range(len(clients))))
+        summary = summarize(latencies, time.perf_counter() - started)
+        summary['errors'] = len(errors)
+        return summary
+
+    def run_async(self, dataset, question, concurrency):
+        """Run the burst through the async views on one event loop."""
+        choices = dataset['choices'][question.pk]
+        clients = []
+        for user in dataset['users']:
+            client = AsyncClient(raise_request_exception=False)
+            client.force_login(user)
+            clients.append(client)
+        latencies, errors = [], []
+
+        async def voter(number, gate):
+            async with gate:
+                for method, url, data in self.flow(
+                        question, choices, number):
+                    begin = time.perf_counter()
+                    response = await getattr(clients[number], method)(
+                        url, data)
+                    latencies.append(time.perf_counter() - begin)
+                    if response.status_code >= 500:
+                        errors.append(response.status_code)
+
+        async def burst():
+            gate = asyncio.Semaphore(concurrency)
+            await asyncio.gather(
+                *[voter(number, gate) for number in range(len(clients))])
+
+        started = time.perf_counter()
+        asyncio.run(burst())
+        summary = summarize(latencies, time.perf_counter() - started)
+        summary['errors'] = len(errors)
+        return summary
@@ -0,0 +1,106 @@
+"""This module contains command to benchmark the SQLite database profiles."""
+
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from polls.benchmark import isolated_database, seed_dataset, summarize
+
+
+class Command(BaseCommand):
+    """Compare vote throughput of the default and production profiles."""
+
+    help = ('Let threads of logged-in voters post votes through the test '
+            'client to a SQLite file, once with the default settings and '
+            'once with the production profile (WAL, pragmas and '
+            'persistent connections), and report votes/sec, latency '
+            'percentiles and failed votes of both. Fails if any vote '
+            'failed.')
+
+    def add_arguments(self, parser):
+        """Add the size of the benchmark."""
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Voters posting at the same time.')
+        parser.add_argument('--votes', type=int, default=2000,
+                            help='Number of vote requests per profile.')
+        parser.add_argument('--users', type=int, default=200,
+                            help='Number of distinct voters.')
+        parser.add_argument('--questions', type=int, default=4,
+                            help='Number of questions voted on.')
+
+    def handle(self, *args, **options):
+        """Run both profiles, print their summaries as JSON, check errors."""
+        profiles = {
+            'default': ({}, 0),
+            'production': (settings.POLLS_SQLITE_PRODUCTION_PRAGMAS,
+                           settings.POLLS_DB_CONN_MAX_AGE),
+        }
+        results = {}
+        for name, (pragmas, max_age) in profiles.items():
+            with tempfile.TemporaryDirectory() as directory, \
+                    override_settings(POLLS_SQLITE_PRAGMAS=pragmas), \
+                    isolated_database(
+                        os.path.join(directory, f'{name}.sqlite3')):
+                results[name] = self.run(options, max_age)
+        results['gain'] = round(
+            results['production']['per_second']
+            / results['default']['per_second'], 2)
+        self.stdout.write(json.dumps(results, indent=2))
+        failed = [name for name in profiles if results[name]['errors']]
+        if failed:
+            raise CommandError(
+                f'Votes failed under the {", ".join(failed)} profile(s).')
+
+    def run(self, options, max_age):
+        """Post the votes from a pool of threads and time them.
+
+        :param options: command options.
+        :param max_age: CONN_MAX_AGE of the connections in the run.
+
+        :returns: summary of the run with the number of failed votes.
+        """
+        dataset = seed_dataset(
+            questions=options['questions'], users=options['users'])
+        clients = []
+        for user in dataset['users']:
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            clients.append(client)
+        # every thread's connection is built from this settings dict
+        default_max_age = connection.settings_dict['CONN_MAX_AGE']
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        connection.close()
+        latencies, errors = [], []
+
+        def voter(number):
+            rng = random.Random(number)
+            question = rng.choice(dataset['questions'])
+            choice = rng.choice(dataset['choices'][question.pk])
+            client = clients[number % len(clients)]
+            begin = time.perf_counter()
+            response = client.post(
+                reverse('polls:vote', args=(question.pk,)),
+                {'choice': choice.pk})
+            latencies.append(time.perf_counter() - begin)
+            if response.status_code != 302:
+                errors.append(response.status_code)
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                list(pool.map(voter, range(options['votes'])))
+            seconds = time.perf_counter() - started
+        finally:
+            connection.settings_dict['CONN_MAX_AGE'] = default_max_age
+        summary = summarize(latencies, seconds)
+        summary['errors'] = len(errors)
+        return summary
@@ -0,0 +1,196 @@
+"""This module contains command to benchmark the polls request paths."""
+
+import json
+import platform
+import random
+import subprocess
+
+import django
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.benchmark import (
+    compare_runs, isolated_database, measure, seed_dataset,
+    use_async_views)
+
+PATHS = ('index', 'detail', 'results', 'vote', 'signup')
+
+
+class Command(BaseCommand):
+    """Measure every request path of the site on a seeded dataset."""
+
+    help = ('Seed a throwaway database, send requests to the index, '
+            'detail, results, vote and signup pages through the WSGI or '
+            'ASGI handler, and report requests/sec, latency percentiles '
+            'and queries per request as JSON. Results can be saved and '
+            'compared with an earlier run to catch regressions.')
+
+    def add_arguments(self, parser):
+        """Add the dataset size, the paths to run and the report files."""
+        parser.add_argument('--questions', type=int, default=20,
+                            help='Number of open questions.')
+        parser.add_argument('--choices', type=int, default=4,
+                            help='Number of choices of each question.')
+        parser.add_argument('--users', type=int, default=200,
+                            help='Number of users.')
+        parser.add_argument('--votes', type=int, default=2000,
+                            help='Number of votes seeded before the run.')
+        parser.add_argument('--requests', type=int, default=300,
+                            help='Requests sent to each path.')
+        parser.add_argument('--signups', type=int, default=20,
+                            help='Requests sent to signup, each of them '
+                                 'hashes a password.')
+        parser.add_argument('--paths', nargs='+', choices=PATHS,
+                            default=list(PATHS),
+                            help='Paths to benchmark.')
+        parser.add_argument('--stack', choices=('wsgi', 'asgi'),
+                            default='wsgi',
+                            help='Handler and views to send requests to.')
+        parser.add_argument('--output', help='Save the results as JSON.')
+        parser.add_argument('--compare', metavar='BASELINE',
+                            help='Fail if the run regresses against the '
+                                 'results saved in this file.')
+        parser.add_argument('--tolerance', type=float, default=0.1,
+                            help='Fraction of timing noise allowed when '
+                                 'comparing.')
+
+    def handle(self, *args, **options):
+        """Seed, run the paths and print, save or compare the results."""
+        dataset_options = {
+            name: options[name]
+            for name in ('questions', 'choices', 'users', 'votes')}
+        with isolated_database(), \
+                use_async_views(options['stack'] == 'asgi'):
+            dataset = seed_dataset(**dataset_options)
+            paths = {
+                path: getattr(self, f'run_{path}')(
+                    dataset, options, self.sender(options['stack']))
+                for path in options['paths']}
+        results = {'meta': self.meta(options, dataset_options),
+                   'paths': paths}
+        report = json.dumps(results, indent=2)
+        self.stdout.write(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(report + '\n')
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as baseline:
+                regressions = compare_runs(
+                    json.load(baseline), results, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against %s:\n%s' % (
+                    options['compare'], '\n'.join(regressions)))
+            self.stdout.write(self.style.SUCCESS(
+                'No regression against %s.' % options['compare']))
+
+    @staticmethod
+    def meta(options, dataset_options):
+        """Describe the run so results of different commits compare."""
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {'commit': commit,
+                'date': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'stack': options['stack'],
+                'settings': {
+                    name: getattr(settings, name) for name in dir(settings)
+                    if name.startswith('POLLS_')},
+                'requests': options['requests'],
+                'dataset': dataset_options}
+
+    @staticmethod
+    def sender(stack):
+        """Return ``send(client, method, url, data)`` for the stack.
+
+        Async requests are run from this thread so their queries are run
+        on, and counted for, the connection of this thread.
+        """
+        def send(client, method, url, data=None):
+            request = getattr(client, method)
+            if stack == 'wsgi':
+                return request(url, data)
+
+            async def arequest():
+                return await request(url, data)
+            return async_to_sync(arequest)()
+        return send
+
+    @staticmethod
+    def client(stack):
+        """Return an anonymous client of the stack.
+
+        Server errors are returned, and counted, instead of raised.
+        """
+        client_class = AsyncClient if stack == 'asgi' else Client
+        return client_class(raise_request_exception=False)
+
+    def clients(self, dataset, stack, count):
+        """Return up to ``count`` clients logged in as seeded users."""
+        clients = []
+        for user in dataset['users'][:count]:
+            client = self.client(stack)
+            client.force_login(user)
+            clients.append(client)
+        return clients
+
+    def run_index(self, dataset, options, send):
+        """Benchmark the index page as an anonymous visitor."""
+        client = self.client(options['stack'])
+        url = reverse('polls:index')
+        return measure(lambda number: send(client, 'get', url),
+                       options['requests'])
+
+    def run_detail(self, dataset, options, send):
+        """Benchmark the detail page of logged-in users."""
+        clients = self.clients(dataset, options['stack'], 50)
+        questions = dataset['questions']
+        return measure(
+            lambda number: send(
+                clients[number % len(clients)], 'get',
+                reverse('polls:detail',
+                        args=(questions[number % len(questions)].pk,))),
+            options['requests'])
+
+    def run_results(self, dataset, options, send):
+        """Benchmark the results page as an anonymous visitor."""
+        client = self.client(options['stack'])
+        questions = dataset['questions']
+        return measure(
+            lambda number: send(
+                client, 'get',
+                reverse('polls:results',
+                        args=(questions[number % len(questions)].pk,))),
+            options['requests'])
+
+    def run_vote(self, dataset, options, send):
+        """Benchmark new and changed votes of logged-in users."""
+        clients = self.clients(dataset, options['stack'], 50)
+        questions = dataset['questions']
+        rng = random.Random(65)
+
+        def vote(number):
+            question = questions[number % len(questions)]
+            choice = rng.choice(dataset['choices'][question.pk])
+            return send(clients[number % len(clients)], 'post',
+                        reverse('polls:vote', args=(question.pk,)),
+                        {'choice': choice.pk})
+        return measure(vote, options['requests'])
+
+    def run_signup(self, dataset, options, send):
+        """Benchmark signups of new users, password hashing included."""
+        client = self.client(options['stack'])
+        password = 'bench-Signup-65'
+        return measure(
+            lambda number: send(client, 'post', reverse('signup'), {
+                'username': f'signup{number}',
+                'password1': password, 'password2': password}),
+            options['signups'])
@@ -0,0 +1,82 @@
+"""This module contains command to benchmark the vote write path."""
+
+import json
+import random
+import time
+
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from polls import buffer
+from polls.benchmark import isolated_database, seed_dataset, summarize
+from polls.views import vote
+
+
+class Command(BaseCommand):
+    """Compare vote throughput of the direct and the buffered path."""
+
+    help = ('Cast votes through polls.views.vote on a throwaway database, '
+            'once writing each vote directly and once through the '
+            'write-behind buffer, and report the throughput of both.')
+
+    def add_arguments(self, parser):
+        """Add the size of the benchmark."""
+        parser.add_argument('--votes', type=int, default=2000,
+                            help='Number of vote requests per run.')
+        parser.add_argument('--users', type=int, default=500,
+                            help='Number of distinct voters.')
+        parser.add_argument('--choices', type=int, default=4,
+                            help='Number of choices of the question.')
+
+    def handle(self, *args, **options):
+        """Run both vote paths and print their summaries as JSON."""
+        with isolated_database():
+            dataset = seed_dataset(
+                questions=2, choices=options['choices'],
+                users=options['users'])
+            direct, buffered = dataset['questions']
+            results = {
+                'direct': self.run(dataset, direct, options['votes']),
+            }
+            with override_settings(POLLS_VOTE_BUFFER=True,
+                                   POLLS_VOTE_BUFFER_INTERVAL=3600):
+                buffer._buffer = None
+                results['buffered'] = self.run(
+                    dataset, buffered, options['votes'],
+                    drain=buffer.get_vote_buffer())
+                buffer._buffer = None
+        results['gain'] = round(
+            results['buffered']['per_second']
+            / results['direct']['per_second'], 2)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, dataset, question, votes, drain=None):
+        """Cast ``votes`` random votes on a question and time them.
+
+        :param dataset: seeded dataset with the voters and choices.
+        :param question: question to vote on.
+        :param votes: number of vote requests.
+        :param drain: vote buffer flushed before the clock stops.
+
+        :returns: summary of the run.
+        """
+        rng = random.Random(question.pk)
+        factory = RequestFactory()
+        choices = dataset['choices'][question.pk]
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(votes):
+            request = factory.post(
+                f'/polls/{question.pk}/vote/',
+                {'choice': rng.choice(choices).pk})
+            request.user = rng.choice(dataset['users'])
+            request.session = SessionBase()
+            request._messages = FallbackStorage(request)
+            begin = time.perf_counter()
+            vote(request, question.pk)
+            latencies.append(time.perf_counter() - begin)
+        if drain is not None:
+            drain.stop()
+        return summarize(latencies, time.perf_counter() - started)
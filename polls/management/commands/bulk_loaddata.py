@@ -0,0 +1,59 @@
+"""This module contains command to stream large fixtures into the database."""
+
+import resource
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from polls.loader import BulkLoader, iter_fixture
+
+
+class Command(BaseCommand):
+    """Load ``loaddata`` style fixtures in bulk without reading them whole."""
+
+    help = ('Stream .json or .jsonl fixtures (loaddata format) into the '
+            'database with batched bulk_create, then report rows/sec and '
+            'peak memory.')
+
+    def add_arguments(self, parser):
+        """Add fixture paths, batch size and pk handling."""
+        parser.add_argument('fixtures', nargs='+',
+                            help='Fixture files, loaded in the given order.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Objects inserted per bulk_create.')
+        parser.add_argument('--keep-pks', action='store_true',
+                            help='Insert objects with their fixture pks '
+                                 'instead of new ones, and use foreign '
+                                 'keys as is instead of requiring the '
+                                 'objects they point to in the fixtures.')
+
+    def handle(self, *args, **options):
+        """Load every fixture and print the per-model counts."""
+        try:
+            loader = BulkLoader(batch_size=options['batch_size'],
+                                keep_pks=options['keep_pks'])
+        except ValueError as error:
+            raise CommandError(error)
+        started = time.perf_counter()
+        # a failed fixture rolls back the batches already inserted
+        with transaction.atomic():
+            for path in options['fixtures']:
+                try:
+                    for item in iter_fixture(path):
+                        loader.add(item)
+                except (OSError, ValueError, LookupError) as error:
+                    raise CommandError(f'{path}: {error}')
+            counts = loader.finish()
+        seconds = time.perf_counter() - started
+        total = sum(counts.values())
+        for label, count in sorted(counts.items()):
+            self.stdout.write(f'{label}: {count}')
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {total} row(s) in {seconds:.2f}s '
+            f'({total / seconds if seconds else 0:.0f} rows/sec), '
+            f'peak RSS {peak_mb:.1f} MB.'))
@@ -0,0 +1,90 @@
+"""This module contains command to audit query plans of the polls views."""
+
+import datetime
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from polls.benchmark import isolated_database, seed_dataset
+from polls.models import Choice, Question, Vote
+from polls.pagination import KeysetPaginator
+from polls.views import DetailView, IndexView, ResultsView
+
+# "SCAN polls_vote" in SQLite, "Seq Scan on polls_vote" in PostgreSQL;
+# "SCAN polls_vote USING INDEX ..." walks an index and is fine.
+FULL_SCAN = re.compile(
+    r'\bSCAN (?P<sqlite>\w+)\b(?! USING)|Seq Scan on (?P<postgres>\w+)')
+
+
+def view_queries(dataset):
+    """Return the queries run by the polls views on a seeded dataset.
+
+    :param dataset: dataset returned by ``seed_dataset``.
+
+    :returns: list of ``(name, queryset)`` pairs.
+    """
+    question = dataset['questions'][-1]
+    choice = dataset['choices'][question.pk][0]
+    user = dataset['users'][-1]
+    now = timezone.now()
+    index = KeysetPaginator(
+        IndexView().get_queryset(),
+        conditions=[Question.objects.published_filter(now)])
+    return [
+        ('index', index.window()[0]),
+        ('index older page', index.window(
+            index.encode_cursor(dataset['questions'][len(
+                dataset['questions']) // 2]))[0]),
+        ('detail question', DetailView().get_queryset().filter(
+            pk=question.pk)),
+        ('detail user vote', Vote.objects.filter(
+            user=user, question=question)),
+        ('results question', ResultsView().get_queryset().filter(
+            pk=question.pk)),
+        ('results tallies', Choice.objects.filter(
+            question=question.pk).order_by('pk')),
+        ('vote choice', Choice.objects.select_related('question').filter(
+            pk=choice.pk, question=question.pk)),
+        ('vote lookup', Vote.objects.filter(user=user, question=question)),
+        ('admin pub_date filter', Question.objects.filter(
+            pub_date__gte=now - datetime.timedelta(days=7),
+            pub_date__lt=now)),
+        ('admin end_date filter', Question.objects.filter(
+            end_date__gte=now, end_date__lt=now + datetime.timedelta(days=1))),
+    ]
+
+
+class Command(BaseCommand):
+    """EXPLAIN the view queries on a large dataset and fail on full scans."""
+
+    help = ('Seed a throwaway database, EXPLAIN the queries of the polls '
+            'views and fail if any of them scans a whole table.')
+
+    def add_arguments(self, parser):
+        """Add the size of the seeded dataset."""
+        parser.add_argument('--questions', type=int, default=5000)
+        parser.add_argument('--choices', type=int, default=4)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--votes', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        """Print each query plan and raise if one does a full scan."""
+        offenders = []
+        with isolated_database():
+            dataset = seed_dataset(
+                questions=options['questions'], choices=options['choices'],
+                users=options['users'], votes=options['votes'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            for name, queryset in view_queries(dataset):
+                plan = queryset.explain()
+                self.stdout.write(f'== {name}\n{plan}\n')
+                for match in FULL_SCAN.finditer(plan):
+                    table = match.group('sqlite') or match.group('postgres')
+                    offenders.append(f'{name} ({table})')
+        if offenders:
+            raise CommandError(
+                'Full table scan in: ' + ', '.join(offenders))
+        self.stdout.write(self.style.SUCCESS('No full table scans.'))
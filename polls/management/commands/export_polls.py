@@ -0,0 +1,43 @@
+"""This module contains command to export vote tallies or raw votes."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.export import EXPORTS, FORMATS, encode, export_lines
+
+
+class Command(BaseCommand):
+    """Stream tallies or votes as CSV or JSONL to a file or stdout."""
+
+    help = ('Export per-question tallies or raw votes as CSV or JSONL '
+            'with constant memory use.')
+
+    def add_arguments(self, parser):
+        """Add export kind, format, compression and destination."""
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Compress the output with gzip.')
+        parser.add_argument('--output', '-o',
+                            help='Output file (default: stdout).')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched from the database at a time.')
+
+    def handle(self, *args, **options):
+        """Write the export chunk by chunk."""
+        chunks = encode(
+            export_lines(options['kind'], options['format'],
+                         chunk_size=options['chunk_size']),
+            compress=options['gzip'])
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        elif hasattr(self.stdout, 'buffer'):
+            for chunk in chunks:
+                self.stdout.buffer.write(chunk)
+            self.stdout.flush()
+        elif options['gzip']:
+            raise CommandError('Use --output to write gzipped exports.')
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode('utf-8'), ending='')
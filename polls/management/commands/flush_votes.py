@@ -0,0 +1,26 @@
+"""This module contains command to drain the write-behind vote buffer."""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.buffer import get_vote_buffer
+
+
+class Command(BaseCommand):
+    """Write every vote waiting in the vote buffer to the database."""
+
+    help = 'Drain the write-behind vote buffer into the database.'
+
+    def handle(self, *args, **options):
+        """Flush until the queue is empty and report the written votes."""
+        vote_buffer = get_vote_buffer()
+        written = 0
+        while vote_buffer.pending() > 0:
+            flushed = vote_buffer.flush()
+            if not flushed:
+                # another worker holds the flush lock, wait for it
+                time.sleep(0.1)
+            written += flushed
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} queued vote(s).'))
@@ -0,0 +1,46 @@
+"""This module contains command to create user accounts from a roster."""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.provisioning import iter_roster, provision_users
+
+
+class Command(BaseCommand):
+    """Create the users of a CSV or JSON roster in bulk."""
+
+    help = ('Create the users of a .csv, .json or .jsonl roster, hashing '
+            'their passwords across a pool of processes and inserting '
+            'them with bulk_create. Usernames already taken are skipped. '
+            'Reports users/sec in total and per worker.')
+
+    def add_arguments(self, parser):
+        """Add the roster path, number of workers and batch size."""
+        parser.add_argument('roster', help='Roster file.')
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Hashing processes (default: one per CPU, 0 to hash in '
+                 'this process).')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Users hashed and inserted together.')
+
+    def handle(self, *args, **options):
+        """Provision the roster and report the throughput."""
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        started = time.perf_counter()
+        try:
+            stats = provision_users(
+                iter_roster(options['roster']), workers=options['workers'],
+                batch_size=options['batch_size'])
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f"{options['roster']}: {error}")
+        seconds = time.perf_counter() - started
+        rate = stats['created'] / seconds if seconds else 0
+        # hashing in this process still uses one core
+        cores = max(stats['workers'], 1)
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {stats['created']} user(s), skipped "
+            f"{stats['skipped']}, in {seconds:.2f}s ({rate:.1f} users/sec, "
+            f"{rate / cores:.1f} per core on {cores} core(s))."))
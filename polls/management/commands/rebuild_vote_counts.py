@@ -0,0 +1,27 @@
+"""This module contains command to rebuild stored vote counters."""
+
+from django.core.management.base import BaseCommand
+
+from polls.models import Question
+from polls.tallies import rebuild_vote_counts
+
+
+class Command(BaseCommand):
+    """Recount vote counters of questions and choices from Vote rows."""
+
+    help = 'Rebuild the stored vote counters from the Vote table.'
+
+    def add_arguments(self, parser):
+        """Add optional question ids to limit the rebuild."""
+        parser.add_argument(
+            'question_ids', nargs='*', type=int,
+            help='Only rebuild these questions (default: all).')
+
+    def handle(self, *args, **options):
+        """Rebuild the counters and report how many questions were done."""
+        questions = Question.objects.all()
+        if options['question_ids']:
+            questions = questions.filter(pk__in=options['question_ids'])
+        rebuilt = rebuild_vote_counts(questions)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt vote counters of {rebuilt} question(s).'))
@@ -0,0 +1,83 @@
+"""This module contains command to refreeze results of closed polls."""
+
+import gzip
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from polls.export import EXPORTS
+from polls.models import Question, ResultSnapshot, Vote
+from polls.tallies import freeze_tallies
+
+
+class Command(BaseCommand):
+    """Freeze the tallies of closed questions into their snapshots."""
+
+    help = ('Freeze the tallies of closed questions again, e.g. after an '
+            'admin reopened and closed a poll, and drop the snapshots of '
+            'questions that are open again. With --archive, the Vote rows '
+            'of closed questions are also written to gzipped JSONL files '
+            'and deleted.')
+
+    def add_arguments(self, parser):
+        """Add optional question ids and the archive directory."""
+        parser.add_argument(
+            'question_ids', nargs='*', type=int,
+            help='Only refreeze these questions (default: all).')
+        parser.add_argument(
+            '--archive', metavar='DIR',
+            help='Move the Vote rows of closed questions to '
+                 'DIR/votes-<id>.jsonl.gz.')
+
+    def handle(self, *args, **options):
+        """Refreeze the questions and report what was done."""
+        now = timezone.now()
+        questions = Question.objects.all()
+        if options['question_ids']:
+            questions = questions.filter(pk__in=options['question_ids'])
+        # archived snapshots are kept, they record that votes are gone
+        thawed, _ = ResultSnapshot.objects.filter(
+            question__in=questions.exclude(end_date__lt=now),
+            votes_archived=False).delete()
+        closed = list(questions.closed(now).only('tally_version'))
+        for question in closed:
+            freeze_tallies(question)
+        archived = 0
+        if options['archive']:
+            directory = Path(options['archive'])
+            if not directory.is_dir():
+                raise CommandError(f'{directory} is not a directory.')
+            for question in closed:
+                archived += self.archive(question, directory)
+        self.stdout.write(self.style.SUCCESS(
+            f'Froze {len(closed)} closed question(s), thawed {thawed}, '
+            f'archived {archived} vote(s).'))
+
+    def archive(self, question, directory):
+        """Write the votes of a question to a file and delete them.
+
+        :param question: closed Question.
+        :param directory: directory of the archive files.
+
+        :returns: number of votes archived.
+        """
+        header = EXPORTS['votes'][0]
+        votes = Vote.objects.filter(question=question).order_by('pk')
+        rows = votes.values_list('user', 'question', 'choice')
+        if not rows.exists():
+            return 0
+        path = directory / f'votes-{question.pk}.jsonl.gz'
+        count = 0
+        # appended, so a question archived again keeps its earlier votes
+        with gzip.open(path, 'at', encoding='utf-8') as archive:
+            for row in rows.iterator(chunk_size=2000):
+                archive.write(json.dumps(dict(zip(header, row))) + '\n')
+                count += 1
+        with transaction.atomic():
+            votes.delete()
+            ResultSnapshot.objects.filter(question=question).update(
+                votes_archived=True)
+        return count
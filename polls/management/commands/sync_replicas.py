@@ -0,0 +1,47 @@
+"""This module contains command to refresh the SQLite read replicas."""
+
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    """Copy the primary SQLite database over its read replicas."""
+
+    help = ('Copy the primary database over the replicas of '
+            'POLLS_READ_REPLICAS with the SQLite backup API. Run it on a '
+            'schedule to let the replicas lag the primary by that much.')
+
+    def add_arguments(self, parser):
+        """Add optional replica aliases to limit the copy."""
+        parser.add_argument(
+            'aliases', nargs='*',
+            help='Only refresh these replicas (default: all).')
+
+    def handle(self, *args, **options):
+        """Copy the primary to each replica and report them."""
+        aliases = options['aliases'] or settings.POLLS_READ_REPLICAS
+        unknown = set(aliases) - set(settings.POLLS_READ_REPLICAS)
+        if unknown:
+            raise CommandError(
+                f'Not in POLLS_READ_REPLICAS: {", ".join(sorted(unknown))}')
+        source = connections[DEFAULT_DB_ALIAS]
+        for alias in [DEFAULT_DB_ALIAS, *aliases]:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(
+                    f'{alias} is not SQLite, use the replication of its '
+                    'database server instead.')
+        source.ensure_connection()
+        for alias in aliases:
+            replica = connections[alias]
+            replica.close()
+            target = sqlite3.connect(replica.settings_dict['NAME'])
+            try:
+                source.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'Copied {DEFAULT_DB_ALIAS} to {alias}.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed {len(aliases)} replica(s).'))
@@ -0,0 +1,171 @@
+"""This module contains the query instrumentation and replica middleware.
+
+When ``POLLS_QUERY_INSTRUMENTATION`` is on, every request counts its SQL
+queries, their total time and repeated statements, logs them as one JSON
+line on the ``polls.queries`` logger and sends the database time in a
+``Server-Timing`` header. When it is off the middleware removes itself
+from the chain at startup and costs nothing.
+
+When ``POLLS_READ_REPLICAS`` is set, the read-only views of
+``POLLS_REPLICA_VIEWS`` read polls models from a replica, except for a
+user who has written something in the last
+``POLLS_REPLICA_STICKY_SECONDS``, who keeps reading the primary so they
+see their own vote.
+"""
+
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .routers import choose_replica, replica_alias
+
+logger = logging.getLogger('polls.queries')
+
+STICKY_COOKIE = 'polls_primary'
+STICKY_SALT = 'polls.middleware.ReplicaMiddleware'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class QueryStats:
+    """Execute wrapper recording the queries of one request."""
+
+    def __init__(self):
+        """Start with no query recorded."""
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Run a query and record its statement and duration."""
+        begin = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - begin
+            self.count += 1
+            self.statements[sql] += 1
+
+    def repeated(self, threshold):
+        """Return ``{statement: runs}`` of statements run often.
+
+        A statement run ``threshold`` times or more in one request is the
+        usual sign of an N+1 query pattern.
+        """
+        return {sql: runs for sql, runs in self.statements.items()
+                if runs >= threshold}
+
+
+class QueryInstrumentationMiddleware:
+    """Count queries and database time of each request."""
+
+    def __init__(self, get_response):
+        """Drop out of the middleware chain unless instrumentation is on."""
+        if not settings.POLLS_QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = settings.POLLS_QUERY_REPEAT_THRESHOLD
+
+    def __call__(self, request):
+        """Record the queries of the request and report them."""
+        stats = QueryStats()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        repeated = stats.repeated(self.threshold)
+        db_ms = stats.seconds * 1000
+        logger.log(
+            logging.WARNING if repeated else logging.INFO,
+            json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': getattr(request.resolver_match, 'view_name', None),
+                'status': response.status_code,
+                'queries': stats.count,
+                'db_ms': round(db_ms, 3),
+                'duplicates': stats.count - len(stats.statements),
+                'n_plus_one': repeated,
+            }))
+        timing = f'db;dur={db_ms:.3f};desc="{stats.count} queries"'
+        if response.has_header('Server-Timing'):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response['Server-Timing'] = timing
+        return response
+
+
+def _pinned(content, alias):
+    """Yield streamed content, reading each chunk from the replica."""
+    iterator = iter(content)
+    while True:
+        token = replica_alias.set(alias)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            replica_alias.reset(token)
+        yield chunk
+
+
+async def _apinned(content, alias):
+    """Yield async streamed content, reading each chunk from the replica."""
+    iterator = aiter(content)
+    while True:
+        token = replica_alias.set(alias)
+        try:
+            chunk = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        finally:
+            replica_alias.reset(token)
+        yield chunk
+
+
+class ReplicaMiddleware:
+    """Read the read-only views from a replica, sticking after writes."""
+
+    def __init__(self, get_response):
+        """Drop out of the middleware chain unless replicas are set."""
+        if not settings.POLLS_READ_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.views = frozenset(settings.POLLS_REPLICA_VIEWS)
+        self.sticky_seconds = settings.POLLS_REPLICA_STICKY_SECONDS
+
+    def __call__(self, request):
+        """Route the request, and pin the user to the primary on writes."""
+        token = replica_alias.set(None)
+        try:
+            response = self.get_response(request)
+            alias = replica_alias.get()
+        finally:
+            replica_alias.reset(token)
+        if alias and response.streaming:
+            # streamed content is read after the request has returned
+            pinned = _apinned if response.is_async else _pinned
+            response.streaming_content = pinned(
+                response.streaming_content, alias)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_signed_cookie(
+                STICKY_COOKIE, '1', salt=STICKY_SALT,
+                max_age=self.sticky_seconds, httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Pick a replica for a read-only view, unless the user is pinned."""
+        if request.method in ('GET', 'HEAD') \
+                and request.resolver_match.view_name in self.views \
+                and not self.pinned(request):
+            replica_alias.set(choose_replica())
+
+    def pinned(self, request):
+        """Return True if the user wrote within the sticky window."""
+        return request.get_signed_cookie(
+            STICKY_COOKIE, default=None, salt=STICKY_SALT,
+            max_age=self.sticky_seconds) is not None
@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-17 06:19
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_vote_counts(apps, schema_editor):
+    """Fill the new counters from the existing Vote rows."""
+    Question = apps.get_model("polls", "Question")
+    Choice = apps.get_model("polls", "Choice")
+    Vote = apps.get_model("polls", "Vote")
+    choice_totals = Vote.objects.values("choice").annotate(total=Count("pk"))
+    for row in choice_totals:
+        Choice.objects.filter(pk=row["choice"]).update(vote_count=row["total"])
+    question_totals = Vote.objects.values("choice__question").annotate(
+        total=Count("pk"))
+    for row in question_totals:
+        Question.objects.filter(pk=row["choice__question"]).update(
+            vote_count=row["total"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0003_remove_choice_votes_alter_question_end_date_vote"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="choice",
+            name="vote_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="votes"),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="vote_count",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="total votes"),
+        ),
+        migrations.RunPython(backfill_vote_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2 on 2026-10-17 07:02
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def backfill_vote_question(apps, schema_editor):
+    """Copy each vote's question from its choice and drop duplicates.
+
+    Only the latest vote of a user on a question is kept, as the view
+    would have updated that one.
+    """
+    Vote = apps.get_model("polls", "Vote")
+    seen = set()
+    duplicates = []
+    votes = Vote.objects.order_by("-pk").values_list(
+        "pk", "user", "choice__question")
+    for pk, user_id, question_id in votes.iterator():
+        if (user_id, question_id) in seen:
+            duplicates.append(pk)
+        seen.add((user_id, question_id))
+    Vote.objects.update(question=models.Subquery(
+        Vote.objects.filter(pk=models.OuterRef("pk")).values(
+            "choice__question")[:1]))
+    if not duplicates:
+        return
+    Vote.objects.filter(pk__in=duplicates).delete()
+    # dropped duplicates were counted by the stored counters
+    Question = apps.get_model("polls", "Question")
+    Choice = apps.get_model("polls", "Choice")
+    for model, field in ((Choice, "choice"), (Question, "question")):
+        totals = Vote.objects.filter(**{field: models.OuterRef("pk")}).values(
+            field).annotate(total=models.Count("pk")).values("total")
+        model.objects.update(
+            vote_count=Coalesce(models.Subquery(totals[:1]), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0004_vote_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="vote",
+            name="question",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="polls.question",
+            ),
+        ),
+        migrations.RunPython(backfill_vote_question, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="vote",
+            name="question",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                to="polls.question",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="vote",
+            constraint=models.UniqueConstraint(
+                fields=("user", "question"), name="unique_vote_per_question"
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-17 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0005_vote_question"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["pub_date", "end_date"],
+                name="polls_quest_pub_dat_24625f_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["end_date"], name="polls_quest_end_dat_935f39_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-17 08:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0006_question_date_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="tally_version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name="choice",
+            name="vote_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="votes"),
+        ),
+        migrations.AlterField(
+            model_name="question",
+            name="vote_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="total votes"),
+        ),
+    ]
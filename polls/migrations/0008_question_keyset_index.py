@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-17 06:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0007_question_tally_version"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["pub_date", "id"],
+                name="polls_quest_pub_dat_306bbb_idx"),
+        ),
+    ]
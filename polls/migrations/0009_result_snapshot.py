@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-17 07:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0008_question_keyset_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResultSnapshot",
+            fields=[
+                (
+                    "question",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="snapshot",
+                        serialize=False,
+                        to="polls.question",
+                    ),
+                ),
+                ("tallies", models.JSONField()),
+                ("tally_version", models.PositiveIntegerField()),
+                ("frozen_at", models.DateTimeField(auto_now=True)),
+                ("votes_archived", models.BooleanField(default=False)),
+            ],
+        ),
+    ]
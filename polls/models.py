@@ -7,12 +7,115 @@ from django.contrib import admin
 from django.contrib.auth.models import User
 
 
-class Question(models.Model):
+class CounterFieldsMixin:
+    """Keep stored counters out of ordinary saves.
+
+    Counters are only changed by F() updates in :mod:`polls.tallies`, so
+    saving an instance loaded earlier (e.g. in the admin) must not write
+    its stale counter values back.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        """Save every field except the counters of an existing row."""
+        if not self._state.adding and kwargs.get('update_fields') is None \
+                and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields]
+        super().save(*args, **kwargs)
+
+
+class QuestionQuerySet(models.QuerySet):
+    """Queries of questions by voting state, computed in the database.
+
+    Every method takes the ``now`` to compare dates with, so one request
+    can use the same instant for all of its queries.
+    """
+
+    def with_status(self, now=None):
+        """Annotate each question with its ``status``.
+
+        :param now: current time, ``timezone.now()`` if not given.
+
+        :returns: queryset whose questions have ``status`` set to
+            ``upcoming``, ``open`` or ``closed``.
+        """
+        now = now or timezone.now()
+        return self.annotate(status=models.Case(
+            models.When(pub_date__gt=now,
+                        then=models.Value(Question.Status.UPCOMING)),
+            models.When(end_date__lt=now,
+                        then=models.Value(Question.Status.CLOSED)),
+            default=models.Value(Question.Status.OPEN),
+            output_field=models.CharField(
+                max_length=8, choices=Question.Status.choices)))
+
+    @staticmethod
+    def published_filter(now):
+        """Return the condition of the questions published by ``now``."""
+        return models.Q(pub_date__lte=now)
+
+    @staticmethod
+    def open_filter(now):
+        """Return the condition of the questions open to votes at ``now``."""
+        return QuestionQuerySet.published_filter(now) & (
+            models.Q(end_date__isnull=True) | models.Q(end_date__gte=now))
+
+    @staticmethod
+    def closed_filter(now):
+        """Return the condition of the questions closed at ``now``."""
+        return models.Q(end_date__lt=now)
+
+    def published(self, now=None):
+        """Return the questions published by ``now``."""
+        return self.filter(self.published_filter(now or timezone.now()))
+
+    def upcoming(self, now=None):
+        """Return the questions not published yet."""
+        return self.filter(pub_date__gt=now or timezone.now())
+
+    def open(self, now=None):
+        """Return the published questions that can be voted on."""
+        return self.filter(self.open_filter(now or timezone.now()))
+
+    def closed(self, now=None):
+        """Return the questions whose voting has ended."""
+        return self.filter(self.closed_filter(now or timezone.now()))
+
+
+class Question(CounterFieldsMixin, models.Model):
     """This class represents a model of question contains choices."""
 
+    class Status(models.TextChoices):
+        """Voting state of a question."""
+
+        UPCOMING = 'upcoming'
+        OPEN = 'open'
+        CLOSED = 'closed'
+
+    counter_fields = ('vote_count', 'tally_version')
+
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField('date published')
     end_date = models.DateTimeField('date ended', null=True, blank=True)
+    vote_count = models.PositiveIntegerField(
+        'total votes', default=0, editable=False)
+    # bumped whenever the tallies change, used as ETag of the results API
+    tally_version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # index page and admin filters on publication and end dates
+            models.Index(fields=['pub_date', 'end_date']),
+            models.Index(fields=['end_date']),
+            # keyset pagination of the index page on (pub_date, id)
+            models.Index(fields=['pub_date', 'id']),
+        ]
 
     def __str__(self) -> str:
         """Return a text of a question.
@@ -53,21 +156,27 @@ class Question(models.Model):
 
         :param self: Question object.
 
+        Questions loaded with ``with_status()`` answer from their
+        annotation without reading the clock.
+
         :returns: can the question be voted.
         """
+        if 'status' in self.__dict__:
+            return self.status == Question.Status.OPEN
         now = timezone.localtime()
-        return (
-            self.is_published() and now <= self.end_date
-            if self.end_date
-            else self.is_published()
-        )
+        return self.pub_date <= now and (
+            self.end_date is None or now <= self.end_date)
 
 
-class Choice(models.Model):
+class Choice(CounterFieldsMixin, models.Model):
     """This class has a ForeignKey as a Question."""
 
+    counter_fields = ('vote_count',)
+
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    vote_count = models.PositiveIntegerField(
+        'votes', default=0, editable=False)
 
     def __str__(self) -> str:
         """Return a text of a choice.
@@ -79,21 +188,55 @@ class Choice(models.Model):
         return str(self.choice_text)
 
     @property
-    def votes(self):
-        """Return vote count in certain choice."""
-        return Vote.objects.filter(choice=self).count()
+    def votes(self) -> int:
+        """Return vote count in certain choice.
+
+        The count is a stored counter kept up to date by
+        :func:`polls.tallies.record_vote`, so reading it costs no query.
+
+        :returns: number of votes for this choice.
+        """
+        return self.vote_count
 
 
 class Vote(models.Model):
-    """Model for votes of question."""
+    """Model for votes of question, one vote per user per question."""
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
 
-    @property
-    def question(self) -> Question:
-        """Return the question holding this vote.
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'question'], name='unique_vote_per_question'),
+        ]
+
+
+class ResultSnapshot(models.Model):
+    """Frozen tallies of a closed question.
+
+    Once voting has ended the tallies can't change, so they are stored in
+    one row and read together with the question. A snapshot only holds
+    while its ``tally_version`` matches the question's, which every
+    change of the question, its choices or its counters bumps.
+    """
+
+    question = models.OneToOneField(
+        Question, on_delete=models.CASCADE, primary_key=True,
+        related_name='snapshot')
+    # [choice id, choice text, votes] of each choice, ordered by id
+    tallies = models.JSONField()
+    tally_version = models.PositiveIntegerField()
+    frozen_at = models.DateTimeField(auto_now=True)
+    # the question's Vote rows were archived and deleted
+    votes_archived = models.BooleanField(default=False)
+
+    def __str__(self) -> str:
+        """Return the question of a snapshot.
+
+        :param self: ResultSnapshot object.
 
-        :returns: question of this vote.
+        :returns: text of the frozen question.
         """
-        return self.choice.question
+        return f'Results of question {self.question_id}'
@@ -0,0 +1,205 @@
+"""This module contains keyset pagination for question lists.
+
+Pages are found by seeking past the ordering key of the last row shown,
+with an index on the same key, instead of counting rows with OFFSET, so
+every page costs the same however deep the visitor goes.
+"""
+
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Func, Q, Value
+from django.db.models.lookups import GreaterThan, LessThan
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor can't be decoded."""
+
+
+class RowValue(Func):
+    """Row value ``(a, b, ...)`` compared column by column."""
+
+    template = '(%(expressions)s)'
+
+
+class KeysetPage:
+    """One page of a keyset paginated list."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        """Create a page.
+
+        :param object_list: objects on the page, in list order.
+        :param next_cursor: cursor of the following page or None.
+        :param previous_cursor: cursor of the preceding page or None.
+        """
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        """Iterate over the objects of the page."""
+        return iter(self.object_list)
+
+    def __len__(self):
+        """Return the number of objects on the page."""
+        return len(self.object_list)
+
+    def has_next(self):
+        """Return True if a following page exists."""
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        """Return True if a preceding page exists."""
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """Paginate a queryset on a unique ordering, e.g. (-pub_date, -id).
+
+    The last ordering field must be unique so every row has its own key;
+    a database index on the ordering fields keeps each page one index
+    range scan.
+    """
+
+    def __init__(self, queryset, ordering=('-pub_date', '-id'),
+                 per_page=5, max_per_page=50, conditions=()):
+        """Create a paginator.
+
+        :param queryset: rows to paginate, without ordering.
+        :param ordering: field names with ``-`` for descending order.
+        :param per_page: page size when none is asked for.
+        :param max_per_page: largest page size a client can ask for.
+        :param conditions: Q objects the rows must also match. They are
+            filtered on after the cursor, see :meth:`window`.
+        """
+        self.queryset = queryset
+        self.conditions = tuple(conditions)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.per_page = per_page
+        self.max_per_page = max_per_page
+
+    def page_size(self, value=None):
+        """Return the asked page size clamped to the allowed range.
+
+        :param value: page size given by the client, may be a string.
+        """
+        try:
+            size = int(value)
+        except (TypeError, ValueError):
+            return self.per_page
+        return max(1, min(size, self.max_per_page))
+
+    def encode_cursor(self, obj, backwards=False):
+        """Return the opaque cursor pointing past ``obj``."""
+        key = [getattr(obj, name) for name in self.fields]
+        # str() keeps the microseconds of datetimes
+        data = json.dumps([int(backwards), key], default=str)
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Return ``(backwards, key values)`` of a cursor.
+
+        :raises InvalidCursor: if the cursor is not one of ours.
+        """
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            backwards, key = json.loads(data)
+            model = self.queryset.model
+            values = [model._meta.get_field(name).to_python(value)
+                      for name, value in zip(self.fields, key, strict=True)]
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError,
+                ValidationError) as error:
+            raise InvalidCursor('Invalid page cursor.') from error
+        return bool(backwards), values
+
+    def seek(self, values, backwards):
+        """Return the filter keeping rows after (or before) a key.
+
+        When every field is sorted the same way the key is compared as a
+        row value, ``(a, b) < (a0, b0)``, which the database answers with
+        one range scan of the index on ``(a, b)`` even next to other
+        bounds on ``a``. Mixed directions fall back to ``a < a0 OR (a =
+        a0 AND b > b0)``.
+        """
+        model = self.queryset.model
+        descending = [name.startswith('-') != backwards
+                      for name in self.ordering]
+        if len(set(descending)) == 1:
+            lookup = LessThan if descending[0] else GreaterThan
+            return lookup(
+                RowValue(*[F(field) for field in self.fields],
+                         output_field=model._meta.pk),
+                RowValue(*[Value(value, model._meta.get_field(field))
+                           for field, value in zip(self.fields, values)],
+                         output_field=model._meta.pk))
+        condition = Q()
+        equal = {}
+        for field, value, down in zip(self.fields, values, descending):
+            lookup = 'lt' if down else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def window(self, cursor=None, size=None):
+        """Return the query of a page, fetching one row more than asked.
+
+        :param cursor: cursor from a previous page, or None.
+        :param size: page size asked for by the client.
+
+        :returns: ``(queryset, size, backwards)``.
+        :raises InvalidCursor: if the cursor can't be decoded.
+        """
+        size = self.page_size(size)
+        backwards = False
+        conditions = self.conditions
+        ordering = self.ordering
+        if cursor:
+            backwards, values = self.decode_cursor(cursor)
+            # SQLite scans the index from the first bound it finds on the
+            # leading column, so the cursor goes before conditions such as
+            # pub_date <= now that would make deep pages scan from the top
+            conditions = (self.seek(values, backwards), *conditions)
+        queryset = self.queryset.filter(*conditions)
+        if backwards:
+            ordering = tuple(name[1:] if name.startswith('-') else f'-{name}'
+                             for name in ordering)
+        return queryset.order_by(*ordering)[:size + 1], size, backwards
+
+    def page(self, cursor=None, size=None):
+        """Return the page a cursor points to, the first one without.
+
+        :param cursor: cursor from a previous page, or None.
+        :param size: page size asked for by the client.
+
+        :raises InvalidCursor: if the cursor can't be decoded.
+        """
+        queryset, size, backwards = self.window(cursor, size)
+        rows = list(queryset)
+        more = len(rows) > size
+        rows = rows[:size]
+        if backwards:
+            rows.reverse()
+        if not rows:
+            return KeysetPage([], None, None)
+        has_next = more if not backwards else True
+        has_previous = bool(cursor) if not backwards else more
+        return KeysetPage(
+            rows,
+            self.encode_cursor(rows[-1]) if has_next else None,
+            self.encode_cursor(rows[0], backwards=True)
+            if has_previous else None)
+
+
+def page_url(request, cursor):
+    """Return the URL of the request with another page cursor.
+
+    :returns: the URL, or None when there is no such page.
+    """
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return f'{request.path}?{query.urlencode()}'
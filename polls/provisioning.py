@@ -0,0 +1,155 @@
+"""This module contains the bulk provisioning of user accounts.
+
+Password hashing (PBKDF2 by default) is what makes creating accounts
+slow, so rosters are hashed in batches across a pool of processes while
+the main process inserts the hashed users with ``bulk_create``.
+Usernames already taken are loaded once into a set and skipped.
+"""
+
+import csv
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import User
+
+from .loader import iter_fixture
+
+# roster columns copied to the user, besides username and password
+FIELDS = ('email', 'first_name', 'last_name', 'is_staff', 'is_active')
+
+
+def iter_roster(path):
+    """Yield one dict per user of a ``.csv``, ``.json`` or ``.jsonl`` file.
+
+    CSV files need a header row. JSON items are either plain objects or
+    ``loaddata`` objects, whose ``fields`` are used, like
+    ``data/users.json``.
+
+    :param path: path of the roster file.
+    """
+    if str(path).endswith('.csv'):
+        with open(path, encoding='utf-8', newline='') as stream:
+            yield from csv.DictReader(stream)
+        return
+    for item in iter_fixture(path):
+        yield item.get('fields', item)
+
+
+def _is_hashed(password):
+    """Return True if the password is already an encoded hash."""
+    try:
+        identify_hasher(password)
+    except ValueError:
+        return False
+    return True
+
+
+def hash_passwords(passwords):
+    """Hash a batch of raw passwords, keeping already hashed ones.
+
+    Empty passwords give unusable ones, as with ``set_unusable_password``.
+
+    :param passwords: list of raw or encoded passwords.
+
+    :returns: list of encoded passwords.
+    """
+    return [password if password and _is_hashed(password)
+            else make_password(password or None)
+            for password in passwords]
+
+
+def _setup_worker():
+    """Configure Django in a worker started without forking."""
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+        django.setup()
+
+
+def _as_bool(value):
+    """Read a boolean roster value, e.g. ``true``, ``1`` or ``False``."""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+
+def _user(row, password):
+    """Build an unsaved user from a roster row and its hashed password."""
+    fields = {name: row[name] for name in FIELDS if row.get(name) not in
+              (None, '')}
+    for name in ('is_staff', 'is_active'):
+        if name in fields:
+            fields[name] = _as_bool(fields[name])
+    return User(username=row['username'], password=password, **fields)
+
+
+def _batches(rows, taken, batch_size, stats):
+    """Yield batches of new roster rows, skipping taken usernames.
+
+    :param rows: roster rows.
+    :param taken: set of usernames in use, updated with the new ones.
+    :param batch_size: rows per batch.
+    :param stats: dict whose ``skipped`` count is incremented.
+    """
+    batch = []
+    for row in rows:
+        username = (row.get('username') or '').strip()
+        if not username or username in taken:
+            stats['skipped'] += 1
+            continue
+        taken.add(username)
+        batch.append({**row, 'username': username})
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def provision_users(rows, workers=None, batch_size=500):
+    """Create the users of a roster, hashing passwords in parallel.
+
+    :param rows: iterable of dicts with ``username``, ``password`` and
+        optional ``email``, ``first_name``, ``last_name``, ``is_staff``
+        and ``is_active``.
+    :param workers: hashing processes, the number of CPUs if None, or 0
+        to hash in this process.
+    :param batch_size: users hashed and inserted together.
+
+    :returns: dict with the numbers of ``created`` and ``skipped`` users
+        and the ``workers`` used.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    taken = set(User.objects.values_list('username', flat=True))
+    stats = {'created': 0, 'skipped': 0, 'workers': workers}
+    batches = _batches(rows, taken, batch_size, stats)
+
+    def insert(batch, passwords):
+        User.objects.bulk_create(
+            [_user(row, password) for row, password in zip(batch, passwords)],
+            batch_size=batch_size)
+        stats['created'] += len(batch)
+
+    if not workers:
+        for batch in batches:
+            insert(batch, hash_passwords(
+                [row.get('password') for row in batch]))
+        return stats
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_setup_worker) as pool:
+        # keep every worker busy while only a few batches are in memory
+        pending = deque()
+        for batch in batches:
+            pending.append((batch, pool.submit(
+                hash_passwords, [row.get('password') for row in batch])))
+            if len(pending) >= 2 * workers:
+                batch, future = pending.popleft()
+                insert(batch, future.result())
+        while pending:
+            batch, future = pending.popleft()
+            insert(batch, future.result())
+    return stats
@@ -0,0 +1,222 @@
+"""This module contains the rate limiter of vote submissions.
+
+When ``POLLS_VOTE_LIMITER`` is on, the vote views ask it before doing any
+work. The last choice each user submitted on a question is remembered
+for ``POLLS_VOTE_DEDUP_SECONDS``, and submitting it again (a double click,
+a reload of the POST) is collapsed into the success the first submission
+got. Each user spends one token of a bucket refilled at
+``POLLS_VOTE_RATE`` tokens per second, up to ``POLLS_VOTE_BURST``, per
+vote that gets through.
+
+State is kept in this process, or in the cache named by
+``POLLS_VOTE_LIMITER_CACHE`` to share it between workers.
+"""
+
+import math
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+# a limited submission: collapsed as a duplicate, or throttled until
+# ``retry_after`` seconds have passed
+Limited = namedtuple('Limited', ['duplicate', 'retry_after'])
+
+
+def _refill(state, now, rate, burst):
+    """Take a token from a bucket.
+
+    :param state: ``(tokens, last update)`` of the bucket, None if new.
+    :param now: current time.
+    :param rate: tokens added per second.
+    :param burst: most tokens the bucket holds.
+
+    :returns: ``(new state, seconds until a token is available)``, the
+        wait being 0 when a token was taken.
+    """
+    tokens, updated = state or (burst, now)
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens < 1:
+        return (tokens, now), (1 - tokens) / rate
+    return (tokens - 1, now), 0
+
+
+class MemoryBackend:
+    """Limiter state in a dict of this process."""
+
+    def __init__(self, max_entries=100000, clock=time.monotonic):
+        """Create an empty backend.
+
+        :param max_entries: entries kept before expired ones are dropped.
+        :param clock: function returning the current time in seconds.
+        """
+        self.max_entries = max_entries
+        self.clock = clock
+        self._values = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def swap(self, key, value, seconds):
+        """Store a value under a key for some seconds.
+
+        :returns: the value stored before, None if there was none.
+        """
+        with self._lock:
+            now = self.clock()
+            previous, expiry = self._values.get(key, (None, now))
+            if len(self._values) >= self.max_entries:
+                self._values = {k: entry for k, entry
+                                in self._values.items() if entry[1] > now}
+            self._values[key] = (value, now + seconds)
+            return previous if expiry > now else None
+
+    def release(self, key, value):
+        """Drop a key if it still holds the value."""
+        with self._lock:
+            if self._values.get(key, (None,))[0] == value:
+                del self._values[key]
+
+    def take(self, key, rate, burst):
+        """Take a token from the bucket of a key.
+
+        :returns: seconds until a token is available, 0 if one was taken.
+        """
+        with self._lock:
+            now = self.clock()
+            if len(self._buckets) >= self.max_entries:
+                # buckets that have refilled are the same as new ones
+                self._buckets = {
+                    k: state for k, state in self._buckets.items()
+                    if state[0] + (now - state[1]) * rate < burst}
+            self._buckets[key], wait = _refill(
+                self._buckets.get(key), now, rate, burst)
+            return wait
+
+
+class CacheBackend:
+    """Limiter state in a Django cache, shared by every worker using it.
+
+    A first value is stored with the atomic ``cache.add``. Replaced
+    values and buckets are read and written back, so two workers doing so
+    at the very same moment may both get through; the limit holds
+    approximately, which is all it is for.
+    """
+
+    def __init__(self, alias, clock=time.time):
+        """Create a backend on a cache alias.
+
+        :param alias: name of the cache in ``CACHES``.
+        :param clock: function returning the current time in seconds,
+            comparable between processes.
+        """
+        self.alias = alias
+        self.clock = clock
+
+    @property
+    def cache(self):
+        """Return the cache holding the state."""
+        return caches[self.alias]
+
+    def swap(self, key, value, seconds):
+        """Store a value under a key for some seconds.
+
+        :returns: the value stored before, None if there was none.
+        """
+        timeout = math.ceil(seconds)
+        if self.cache.add(key, value, timeout):
+            return None
+        previous = self.cache.get(key)
+        if previous != value:
+            self.cache.set(key, value, timeout)
+        return previous
+
+    def release(self, key, value):
+        """Drop a key if it still holds the value."""
+        if self.cache.get(key) == value:
+            self.cache.delete(key)
+
+    def take(self, key, rate, burst):
+        """Take a token from the bucket of a key.
+
+        :returns: seconds until a token is available, 0 if one was taken.
+        """
+        state, wait = _refill(self.cache.get(key), self.clock(), rate, burst)
+        # an untouched bucket is full again after burst / rate seconds
+        self.cache.set(key, state, math.ceil(burst / rate) + 1)
+        return wait
+
+
+class VoteLimiter:
+    """Collapse repeated vote submissions and throttle each user."""
+
+    def __init__(self, backend, window=5.0, rate=1.0, burst=5):
+        """Create a limiter.
+
+        :param backend: MemoryBackend or CacheBackend holding the state.
+        :param window: seconds identical submissions are collapsed for,
+            0 to never collapse them.
+        :param rate: votes a user can make per second in the long run, 0
+            for no limit.
+        :param burst: votes a user can make at once.
+        """
+        self.backend = backend
+        self.window = window
+        self.rate = rate
+        self.burst = burst
+
+    @staticmethod
+    def _key(user_id, question_id):
+        """Return the key of the last choice a user submitted."""
+        return f'polls:limit:vote:{user_id}:{question_id}'
+
+    def check(self, user_id, question_id, choice_id):
+        """Decide whether a vote submission goes through.
+
+        :param user_id: id of the voter.
+        :param question_id: id of the question voted on.
+        :param choice_id: submitted choice, as posted.
+
+        :returns: None if the vote should be cast, otherwise Limited.
+        """
+        if self.window > 0 and self.backend.swap(
+                self._key(user_id, question_id), choice_id,
+                self.window) == choice_id:
+            return Limited(duplicate=True, retry_after=0)
+        if self.rate > 0:
+            wait = self.backend.take(
+                f'polls:limit:bucket:{user_id}', self.rate, self.burst)
+            if wait:
+                # not cast, so a retry must not be collapsed into it
+                self.forget(user_id, question_id, choice_id)
+                return Limited(duplicate=False,
+                               retry_after=math.ceil(wait))
+        return None
+
+    def forget(self, user_id, question_id, choice_id):
+        """Forget a submission that failed, so it can be retried."""
+        self.backend.release(self._key(user_id, question_id), choice_id)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_vote_limiter():
+    """Return the vote limiter of this process.
+
+    It is built again when the ``POLLS_VOTE_*`` limiter settings change.
+
+    :returns: VoteLimiter configured from the settings.
+    """
+    global _limiter
+    config = (settings.POLLS_VOTE_LIMITER_CACHE,
+              settings.POLLS_VOTE_DEDUP_SECONDS, settings.POLLS_VOTE_RATE,
+              settings.POLLS_VOTE_BURST)
+    with _limiter_lock:
+        if _limiter is None or _limiter[0] != config:
+            alias, window, rate, burst = config
+            backend = CacheBackend(alias) if alias else MemoryBackend()
+            _limiter = (config, VoteLimiter(backend, window, rate, burst))
+        return _limiter[1]
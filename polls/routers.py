@@ -0,0 +1,65 @@
+"""This module contains the read-replica database router.
+
+Replicas are the database aliases listed in ``POLLS_READ_REPLICAS``.
+:class:`polls.middleware.ReplicaMiddleware` picks one for requests to the
+read-only views of ``POLLS_REPLICA_VIEWS`` and stores it in
+:data:`replica_alias` for the duration of the request; polls models are
+then read from it. Everything else, every write and every read outside
+such a request, uses the primary ``default`` database.
+"""
+
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# alias of the replica the current request reads from, None for primary
+replica_alias = ContextVar('polls_replica_alias', default=None)
+
+
+def choose_replica():
+    """Return the alias of a random replica, or None without replicas."""
+    if not settings.POLLS_READ_REPLICAS:
+        return None
+    return random.choice(settings.POLLS_READ_REPLICAS)
+
+
+def reading_replica():
+    """Return True if the current request reads from a replica.
+
+    Caches shared with the requests reading the primary must not be
+    filled from a replica, which may lag behind.
+    """
+    return replica_alias.get() is not None
+
+
+class ReplicaRouter:
+    """Send reads of polls models to the request's replica."""
+
+    def db_for_read(self, model, **hints):
+        """Read polls models from the replica chosen for the request.
+
+        Sessions and users stay on the primary, so a login is seen at
+        once by every request.
+        """
+        if model._meta.app_label == 'polls':
+            return replica_alias.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        """Write everything to the primary, even rows read on a replica."""
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Relate rows of the primary and its replicas freely."""
+        databases = {DEFAULT_DB_ALIAS, *settings.POLLS_READ_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Don't migrate replicas, ``sync_replicas`` copies the schema."""
+        if db in settings.POLLS_READ_REPLICAS:
+            return False
+        return None
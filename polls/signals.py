@@ -0,0 +1,95 @@
+"""This module contains signal receivers of polls app."""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import Count, F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .fragments import invalidate_fragments
+from .models import Choice, Question, Vote
+from .tallies import apply_vote_deltas, invalidate_tallies, tallies_changed
+
+
+def _expire(question_id, announce=False):
+    """Expire cached tallies and pages of a question once committed.
+
+    Until then other connections still read the old rows, and a page
+    cached from them would outlive the change.
+
+    :param question_id: id of the changed question.
+    :param announce: also send ``tallies_changed`` to the live viewers.
+    """
+    def expire():
+        invalidate_tallies(question_id)
+        invalidate_fragments()
+        if announce:
+            tallies_changed.send(
+                sender=Question, question_id=question_id, deltas=None)
+
+    transaction.on_commit(expire)
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, created, raw, **kwargs):
+    """Expire cached tallies, ETag and pages when a question is saved."""
+    if not created and not raw:
+        Question.objects.filter(pk=instance.pk).update(
+            tally_version=F('tally_version') + 1)
+    _expire(instance.pk)
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, **kwargs):
+    """Expire cached tallies and pages when a question is deleted."""
+    _expire(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def choice_changed(sender, instance, raw=False, **kwargs):
+    """Expire cached tallies, ETag and pages when a choice changes."""
+    if not raw:
+        Question.objects.filter(pk=instance.question_id).update(
+            tally_version=F('tally_version') + 1)
+    _expire(instance.question_id, announce=True)
+
+
+def _withdraw(votes):
+    """Take votes about to be cascade-deleted off the stored counters.
+
+    Runs inside the delete's transaction, before the Vote rows go, and
+    expires the tallies of their questions once committed.
+
+    :param votes: queryset of the votes being deleted.
+    """
+    deltas = {}
+    rows = votes.order_by().values_list('question', 'choice')
+    for question_id, choice_id, count in rows.annotate(count=Count('pk')):
+        deltas.setdefault(question_id, {})[choice_id] = -count
+    if deltas:
+        apply_vote_deltas(deltas)
+        for question_id in deltas:
+            _expire(question_id)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def voter_deleted(sender, instance, **kwargs):
+    """Withdraw the votes of a user being deleted from the counters."""
+    _withdraw(Vote.objects.filter(user=instance.pk))
+
+
+@receiver(pre_delete, sender=Choice)
+def choice_deleted(sender, instance, **kwargs):
+    """Withdraw the votes of a choice being deleted from the counters."""
+    _withdraw(Vote.objects.filter(choice=instance.pk))
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Run ``POLLS_SQLITE_PRAGMAS`` on every new SQLite connection."""
+    if connection.vendor != 'sqlite' or not settings.POLLS_SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.POLLS_SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
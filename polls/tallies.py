@@ -0,0 +1,335 @@
+"""This module keeps the stored vote counters and the cached tallies."""
+
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Choice, Question, ResultSnapshot, Vote
+from .routers import reading_replica
+
+# Sent with ``question_id`` and ``deltas`` (choice id to vote change, or
+# None when the tallies must be read again) whenever tallies change.
+tallies_changed = Signal()
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def _tally_key(question_id):
+    """Return the cache key holding the tallies of a question."""
+    return f'polls:tallies:{question_id}'
+
+
+def _count(outcome):
+    """Increment the hit or miss counter of the results cache."""
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def _as_dicts(rows):
+    """Turn cached tally rows into dicts for the templates."""
+    return [
+        {'id': pk, 'choice_text': text, 'votes': votes}
+        for pk, text, votes in rows]
+
+
+def cache_stats():
+    """Return the hit and miss counters of the results cache.
+
+    :returns: dict with ``hits`` and ``misses`` of this process.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def get_tallies(question_id):
+    """Return the choices of a question with their vote counts.
+
+    Tallies are read from the cache when ``POLLS_RESULTS_CACHE`` is on,
+    otherwise one query fetches them from the stored counters. Counts
+    read from a replica are not cached, as the replica may lag behind.
+
+    :param question_id: id of the question.
+
+    :returns: list of dicts with ``id``, ``choice_text`` and ``votes``.
+    """
+    enabled = settings.POLLS_RESULTS_CACHE
+    if enabled:
+        rows = cache.get(_tally_key(question_id))
+        if rows is not None:
+            _count('hits')
+            return _as_dicts(rows)
+        _count('misses')
+    rows = list(
+        Choice.objects.filter(question=question_id).order_by('pk')
+        .values_list('pk', 'choice_text', 'vote_count'))
+    if enabled and not reading_replica():
+        cache.set(_tally_key(question_id), rows,
+                  settings.POLLS_RESULTS_CACHE_TIMEOUT)
+    return _as_dicts(rows)
+
+
+async def aget_tallies(question_id):
+    """Async version of :func:`get_tallies` for the async views.
+
+    :param question_id: id of the question.
+
+    :returns: list of dicts with ``id``, ``choice_text`` and ``votes``.
+    """
+    enabled = settings.POLLS_RESULTS_CACHE
+    if enabled:
+        rows = await cache.aget(_tally_key(question_id))
+        if rows is not None:
+            _count('hits')
+            return _as_dicts(rows)
+        _count('misses')
+    rows = [
+        row async for row in Choice.objects.filter(
+            question=question_id).order_by('pk')
+        .values_list('pk', 'choice_text', 'vote_count')]
+    if enabled and not reading_replica():
+        await cache.aset(_tally_key(question_id), rows,
+                         settings.POLLS_RESULTS_CACHE_TIMEOUT)
+    return _as_dicts(rows)
+
+
+def freeze_tallies(question, exists=None):
+    """Store the tallies of a closed question in its snapshot.
+
+    :param question: closed Question.
+    :param exists: whether the question already has a snapshot, None if
+        not known.
+
+    :returns: list of dicts with ``id``, ``choice_text`` and ``votes``.
+    """
+    rows = list(
+        Choice.objects.filter(question=question.pk).order_by('pk')
+        .values_list('pk', 'choice_text', 'vote_count'))
+    updated = exists is not False and ResultSnapshot.objects.filter(
+        question=question.pk).update(
+            tallies=rows, tally_version=question.tally_version,
+            frozen_at=timezone.now())
+    if not updated:
+        # a concurrent first read may have frozen it already
+        ResultSnapshot.objects.bulk_create([ResultSnapshot(
+            question_id=question.pk, tallies=rows,
+            tally_version=question.tally_version)], ignore_conflicts=True)
+    return _as_dicts(rows)
+
+
+def closed_tallies(question):
+    """Return the frozen tallies of a closed question.
+
+    The question should be loaded with ``with_status()`` and
+    ``select_related('snapshot')``, so a valid snapshot costs no query.
+    A closed question without one is frozen on this first read.
+
+    :param question: Question.
+
+    :returns: list of dicts with ``id``, ``choice_text`` and ``votes``, or
+        None if the question is not closed.
+    """
+    if getattr(question, 'status', None) != Question.Status.CLOSED:
+        return None
+    try:
+        snapshot = question.snapshot
+    except ResultSnapshot.DoesNotExist:
+        snapshot = None
+    if snapshot is not None \
+            and snapshot.tally_version == question.tally_version:
+        return _as_dicts(snapshot.tallies)
+    return freeze_tallies(question, exists=snapshot is not None)
+
+
+def invalidate_tallies(*question_ids):
+    """Drop the cached tallies of the given questions.
+
+    :param question_ids: ids of the questions.
+    """
+    if settings.POLLS_RESULTS_CACHE:
+        cache.delete_many([_tally_key(pk) for pk in question_ids])
+
+
+def cast_vote(user, question, choice_id):
+    """Store the user's vote on a question and update the counters.
+
+    Every transaction starts with its write, so on SQLite it waits for
+    the write lock instead of holding a read lock that cannot be upgraded
+    while another voter writes ("database is locked"). The vote is
+    inserted, and if the user already has one (the database rejects the
+    second row) it is moved with an UPDATE that only matches the choice
+    read just before, so concurrent submissions of the same user never
+    move the counters twice.
+
+    :param user: voter.
+    :param question: Question voted on.
+    :param choice_id: id of the selected choice of that question.
+
+    :returns: id of the previously selected choice, None for a new vote.
+    """
+    votes = Vote.objects.filter(user=user, question=question)
+    while True:
+        try:
+            with transaction.atomic():
+                Vote.objects.create(
+                    user=user, question=question, choice_id=choice_id)
+                record_vote(question, choice_id)
+            return None
+        except IntegrityError:
+            previous_choice_id = votes.values_list(
+                'choice_id', flat=True).first()
+            if previous_choice_id is None:
+                # not a second vote, e.g. the choice was deleted
+                raise
+        if previous_choice_id == choice_id:
+            return previous_choice_id
+        with transaction.atomic():
+            moved = votes.filter(
+                choice=previous_choice_id).update(choice=choice_id)
+            if moved:
+                record_vote(question, choice_id, previous_choice_id)
+        if moved:
+            return previous_choice_id
+
+
+async def acast_vote(user, question, choice_id):
+    """Async version of :func:`cast_vote` for the async vote view.
+
+    The vote and its counters must be written in one transaction, which
+    the async ORM can't span, so it runs in the thread of the sync ORM.
+    Written one statement at a time, a concurrent move of the same vote
+    could take it off a choice before it was counted there.
+
+    :param user: voter.
+    :param question: Question voted on.
+    :param choice_id: id of the selected choice of that question.
+
+    :returns: id of the previously selected choice, None for a new vote.
+    """
+    return await sync_to_async(cast_vote)(user, question, choice_id)
+
+
+def _vote_deltas(choice_id, previous_choice_id):
+    """Return the choice counter changes of one cast or moved vote."""
+    deltas = {choice_id: 1}
+    if previous_choice_id is not None:
+        deltas[previous_choice_id] = -1
+    return deltas
+
+
+def _question_changes(previous_choice_id):
+    """Return the question UPDATE for one cast or moved vote."""
+    changes = {'tally_version': F('tally_version') + 1}
+    if previous_choice_id is None:
+        changes['vote_count'] = F('vote_count') + 1
+    return changes
+
+
+def _announce(deltas):
+    """Drop the cached tallies and send ``tallies_changed`` on commit.
+
+    Until the transaction commits, other connections still read the old
+    counters, so a cache filled in between would keep them.
+
+    :param deltas: dict mapping question id to its choice deltas, or to
+        None when the tallies must be read again.
+    """
+    def announce():
+        invalidate_tallies(*deltas)
+        for question_id, choices in deltas.items():
+            tallies_changed.send(
+                sender=Question, question_id=question_id, deltas=choices)
+
+    transaction.on_commit(announce)
+
+
+def record_vote(question, choice_id, previous_choice_id=None):
+    """Apply one cast or moved vote to the stored counters.
+
+    Counters are updated with F() expressions so concurrent voters never
+    overwrite each other's increments.
+
+    :param question: Question the vote belongs to.
+    :param choice_id: id of the newly selected choice.
+    :param previous_choice_id: id of the choice the user voted for before,
+        or None if this is the user's first vote on the question.
+    """
+    if previous_choice_id == choice_id:
+        return
+    with transaction.atomic():
+        Question.objects.filter(pk=question.pk).update(
+            **_question_changes(previous_choice_id))
+        if previous_choice_id is not None:
+            Choice.objects.filter(pk=previous_choice_id).update(
+                vote_count=F('vote_count') - 1)
+        Choice.objects.filter(pk=choice_id).update(
+            vote_count=F('vote_count') + 1)
+        _announce({question.pk: _vote_deltas(choice_id, previous_choice_id)})
+
+
+def _shift(queryset, deltas, **changes):
+    """Add a per-row delta to ``vote_count`` with a single UPDATE."""
+    if not deltas:
+        return
+    queryset.filter(pk__in=deltas).update(vote_count=F('vote_count') + Case(
+        *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+        default=Value(0), output_field=IntegerField()), **changes)
+
+
+def apply_vote_deltas(deltas):
+    """Apply a batch of counter changes in one UPDATE per table.
+
+    :param deltas: dict mapping question id to a dict of choice id to its
+        vote change; a question's total changes by the sum of its choices.
+    """
+    choice_deltas = {}
+    for choices in deltas.values():
+        choice_deltas.update(
+            (pk, delta) for pk, delta in choices.items() if delta)
+    with transaction.atomic():
+        _shift(Choice.objects, choice_deltas)
+        _shift(Question.objects, {
+            pk: sum(choices.values()) for pk, choices in deltas.items()},
+            tally_version=F('tally_version') + 1)
+        _announce(deltas)
+
+
+def rebuild_vote_counts(questions=None):
+    """Recount the stored counters from the Vote rows.
+
+    Questions whose votes were archived keep their counters.
+
+    :param questions: queryset of questions to rebuild, all questions
+        if not given.
+
+    :returns: number of questions rebuilt.
+    """
+    if questions is None:
+        questions = Question.objects.all()
+    # their votes are gone, the stored counters are all that is left
+    questions = questions.exclude(snapshot__votes_archived=True)
+    question_ids = list(questions.values_list('pk', flat=True))
+    choice_totals = dict(
+        Vote.objects.filter(question__in=questions.values('pk'))
+        .values_list('choice').annotate(total=Count('pk')))
+    with transaction.atomic():
+        choices = list(Choice.objects.filter(
+            question__in=questions.values('pk')).only('question'))
+        question_totals = dict.fromkeys(question_ids, 0)
+        for choice in choices:
+            choice.vote_count = choice_totals.get(choice.pk, 0)
+            question_totals[choice.question_id] += choice.vote_count
+        Choice.objects.bulk_update(choices, ['vote_count'], batch_size=500)
+        Question.objects.bulk_update(
+            [Question(pk=pk, vote_count=total)
+             for pk, total in question_totals.items()],
+            ['vote_count'], batch_size=500)
+        questions.update(tally_version=F('tally_version') + 1)
+        _announce(dict.fromkeys(question_ids))
+    return len(question_ids)
@@ -1,11 +1,43 @@
 """Contain test for polls app."""
 
 import datetime
+import gzip
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+from pathlib import Path
 from django.urls import reverse
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.db import (
+    IntegrityError, OperationalError, connection, transaction)
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, TestCase, TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
+from django.contrib.auth.hashers import is_password_usable, make_password
 from django.contrib.auth.models import User
-from .models import Question, Vote
+from . import buffer, fragments, ratelimit, signals
+from .events import broker, live_results
+from .benchmark import (
+    compare_runs, isolated_database, measure, use_async_views)
+from .management.commands.explain_queries import FULL_SCAN
+from .loader import BulkLoader, iter_fixture, iter_json_array
+from .middleware import (
+    STICKY_COOKIE, QueryInstrumentationMiddleware, ReplicaMiddleware)
+from .models import Choice, Question, ResultSnapshot, Vote
+from .pagination import KeysetPaginator
+from .provisioning import hash_passwords
+from .routers import ReplicaRouter, replica_alias
+from .tallies import (
+    cast_vote, cache_stats, get_tallies, rebuild_vote_counts)
 
 
 def create_question(question_text, days, seconds=0, end_in=0):
@@ -138,6 +170,188 @@ class QuestionModelTests(TestCase):
         self.assertIs(question.can_vote(), True)
 
 
+class QuestionStatusTests(TestCase):
+    """This class contains test for the voting state computed in SQL."""
+
+    def setUp(self):
+        """Create an upcoming, an open, an open-ended and a closed poll."""
+        self.upcoming = create_question(
+            question_text="Upcoming.", days=2, end_in=3)
+        self.open = create_question(question_text="Open.", days=-2, end_in=5)
+        self.endless = Question.objects.create(
+            question_text="Endless.",
+            pub_date=timezone.localtime() - datetime.timedelta(days=1))
+        self.closed = create_question(
+            question_text="Closed.", days=-5, end_in=2)
+
+    def test_with_status(self):
+        """Each question is annotated with its state against one now."""
+        statuses = dict(Question.objects.with_status().values_list(
+            'question_text', 'status'))
+        self.assertEqual(statuses, {'Upcoming.': 'upcoming',
+                                    'Open.': 'open',
+                                    'Endless.': 'open',
+                                    'Closed.': 'closed'})
+
+    def test_state_filters(self):
+        """The state filters agree with can_vote and is_published."""
+        questions = Question.objects.order_by('pk')
+        self.assertEqual(list(questions.open()), [self.open, self.endless])
+        self.assertEqual(list(questions.closed()), [self.closed])
+        self.assertEqual(list(questions.upcoming()), [self.upcoming])
+        for question in questions.with_status():
+            self.assertEqual(question.can_vote(),
+                             Question.objects.get(pk=question.pk).can_vote())
+
+    def test_index_uses_annotation(self):
+        """The index shows vote buttons for open polls only."""
+        response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, 'href="%s"' % reverse(
+            'polls:detail', args=(self.open.id,)), 2)
+        self.assertContains(response, 'href="%s"' % reverse(
+            'polls:detail', args=(self.closed.id,)), 1)
+
+    def test_admin_status_filter(self):
+        """The admin lists and filters questions by state."""
+        admin_user = User.objects.create_superuser(
+            username="admin", email="admin@email.com", password="pass")
+        self.client.force_login(admin_user)
+        response = self.client.get(
+            reverse('admin:polls_question_changelist'), {'status': 'open'})
+        self.assertEqual(
+            {question.pk for question in response.context['cl'].result_list},
+            {self.open.pk, self.endless.pk})
+        self.assertContains(response, 'Open')
+
+    def test_json_status_filter(self):
+        """The questions API keeps the questions of the asked state."""
+        response = self.client.get(reverse('polls:questions_json'),
+                                   {'status': 'closed'})
+        self.assertEqual(
+            [(item['id'], item['status'])
+             for item in response.json()['results']],
+            [(self.closed.id, 'closed')])
+        response = self.client.get(reverse('polls:questions_json'),
+                                   {'status': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+
+
+class QuestionAdminTest(TestCase):
+    """This class contains test for the annotated admin changelist."""
+
+    def setUp(self):
+        """Log in an admin and create questions with votes and choices."""
+        self.client.force_login(User.objects.create_superuser(
+            username="admin", email="admin@email.com", password="pass"))
+        self.busy = create_question(
+            question_text='Busy.', days=-2, end_in=5)
+        self.quiet = create_question(
+            question_text='Quiet.', days=-1, end_in=5)
+        self.choice = self.busy.choice_set.create(choice_text="one")
+        self.busy.choice_set.create(choice_text="two")
+        for number in range(12):
+            cast_vote(User.objects.create(username=f"voter{number}"),
+                      self.busy, self.choice.id)
+        self.url = reverse('admin:polls_question_changelist')
+
+    def changelist(self, **params):
+        """Return the questions of the changelist, in order."""
+        response = self.client.get(self.url, params)
+        return [question.pk for question in
+                response.context['cl'].result_list]
+
+    def test_totals_without_per_row_queries(self):
+        """Totals are annotated, so more questions cost no more queries."""
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get(self.url)
+        self.assertContains(response, '<td class="field-vote_count">12</td>')
+        self.assertContains(response, '<td class="field-choice_count">2</td>')
+        for number in range(5):
+            create_question(question_text=f'More {number}.', days=-3)
+        with self.assertNumQueries(len(few)):
+            self.client.get(self.url)
+
+    def test_sort_and_filter_by_totals(self):
+        """Questions can be sorted and filtered by votes and choices."""
+        self.assertEqual(self.changelist(o='-5'),
+                         [self.busy.pk, self.quiet.pk])
+        self.assertEqual(self.changelist(o='6'),
+                         [self.quiet.pk, self.busy.pk])
+        self.assertEqual(self.changelist(votes='10-99'), [self.busy.pk])
+        self.assertEqual(self.changelist(votes='0'), [self.quiet.pk])
+        self.assertEqual(self.changelist(choices='2-'), [self.busy.pk])
+
+    def test_inline_shows_choice_votes(self):
+        """The choice inline shows each choice's stored vote count."""
+        url = reverse('admin:polls_question_change', args=(self.busy.id,))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, '<p>12</p>')
+        self.assertFalse([query for query in queries
+                          if 'polls_vote' in query['sql']])
+
+
+class AnalyticsTest(TestCase):
+    """This class contains test for the admin analytics dashboard."""
+
+    def setUp(self):
+        """Create polls in every state, voters and an empty cache."""
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username="admin", email="admin@email.com", password="pass")
+        self.open = create_question(question_text='Open.', days=-2, end_in=5)
+        self.closed = create_question(
+            question_text='Closed.', days=-5, end_in=2)
+        create_question(question_text='Upcoming.', days=2, end_in=3)
+        choice = self.open.choice_set.create(choice_text="one")
+        closed_choice = self.closed.choice_set.create(choice_text="one")
+        for number in range(3):
+            voter = User.objects.create(username=f"voter{number}")
+            cast_vote(voter, self.open, choice.id)
+        cast_vote(voter, self.closed, closed_choice.id)
+        self.url = reverse('admin:polls_question_analytics')
+
+    def test_panels(self):
+        """Each panel is one query, and refreshes are served cached."""
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        panels = response.context['panels']
+        self.assertEqual(panels['status'],
+                         {'upcoming': 1, 'open': 1, 'closed': 1})
+        self.assertEqual(panels['turnout'],
+                         {'users': 4, 'voters': 3, 'rate': 75.0})
+        self.assertEqual([(row['id'], row['rate'])
+                          for row in panels['participation']],
+                         [(self.open.id, 75.0)])
+        self.assertEqual([row['id'] for row in panels['most_active']],
+                         [self.open.id, self.closed.id])
+        panel_queries = [query for query in queries
+                         if 'polls_question' in query['sql']
+                         or 'polls_vote' in query['sql']]
+        self.assertEqual(len(panel_queries), 4)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        self.assertFalse([query for query in queries
+                          if 'polls_' in query['sql']])
+
+    def test_results_cache_panel(self):
+        """The hit rate of the results cache is shown live."""
+        self.client.force_login(self.admin)
+        with mock.patch('polls.analytics.cache_stats',
+                        return_value={'hits': 3, 'misses': 1}):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['results_cache'],
+                         {'hits': 3, 'misses': 1, 'rate': 75.0})
+        self.assertContains(response, '3 hits and 1 misses')
+
+    def test_staff_only(self):
+        """Visitors who are not staff are sent to the admin login."""
+        self.client.force_login(User.objects.get(username='voter0'))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+
 class QuestionIndexViewTests(TestCase):
     """This class contains test for Index view and behavior."""
 
@@ -206,6 +420,105 @@ class QuestionIndexViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+class KeysetPaginationTest(TestCase):
+    """This class contains test for the keyset pagination of questions."""
+
+    def setUp(self):
+        """Create twelve past questions, four of them published together."""
+        self.questions = [
+            create_question(question_text=f"Question {number}.",
+                            days=-number)
+            for number in range(1, 9)]
+        same_time = timezone.localtime() - datetime.timedelta(days=20)
+        self.questions += [
+            Question.objects.create(question_text=f"Tied {number}.",
+                                    pub_date=same_time)
+            for number in range(4)]
+        create_question(question_text="Future question.", days=5)
+        # newest first, ties broken by descending id
+        self.expected = self.questions[:8] + self.questions[:7:-1]
+
+    def walk(self, url, key, **params):
+        """Follow the next links of a paginated list to the end."""
+        seen = []
+        response = self.client.get(url, params)
+        while True:
+            seen.append(response)
+            link = key(response)
+            if link is None:
+                return seen
+            response = self.client.get(link)
+
+    def test_pages_cover_every_question_once(self):
+        """Following older links lists every published question once."""
+        pages = self.walk(
+            reverse('polls:index'), lambda page: page.context['older_url'],
+            page_size=5)
+        self.assertEqual([len(page.context['latest_question_list'])
+                          for page in pages], [5, 5, 2])
+        self.assertEqual(
+            [question for page in pages
+             for question in page.context['latest_question_list']],
+            self.expected)
+
+    def test_newer_link_goes_back(self):
+        """The newer link of a page shows the page before it."""
+        first = self.client.get(reverse('polls:index'), {'page_size': 5})
+        second = self.client.get(first.context['older_url'])
+        self.assertIsNone(first.context['newer_url'])
+        back = self.client.get(second.context['newer_url'])
+        self.assertEqual(list(back.context['latest_question_list']),
+                         self.expected[:5])
+        self.assertIsNone(back.context['newer_url'])
+
+    def test_page_size_is_clamped(self):
+        """Page sizes are kept between one and the maximum."""
+        with self.settings(POLLS_MAX_PAGE_SIZE=3):
+            response = self.client.get(reverse('polls:index'),
+                                       {'page_size': 100})
+            self.assertEqual(len(response.context['latest_question_list']),
+                             3)
+        response = self.client.get(reverse('polls:index'), {'page_size': 0})
+        self.assertEqual(len(response.context['latest_question_list']), 1)
+
+    def test_deep_page_costs_one_query(self):
+        """Any page is fetched with a single query."""
+        page = self.client.get(reverse('polls:questions_json'),
+                               {'page_size': 2})
+        for _ in range(4):
+            page = self.client.get(page.json()['next'])
+        with self.assertNumQueries(1):
+            self.client.get(page.json()['next'])
+
+    def test_cursor_is_the_first_condition(self):
+        """The seek comes before the other conditions of the query."""
+        now = timezone.now()
+        paginator = KeysetPaginator(
+            Question.objects.with_status(now),
+            conditions=[Question.objects.published_filter(now)])
+        queryset, _, _ = paginator.window(
+            paginator.encode_cursor(self.questions[3]))
+        where = str(queryset.query).split(' WHERE ')[1]
+        self.assertLess(where.index(' < ('), where.index('"pub_date" <='))
+        self.assertEqual(list(queryset), self.expected[4:10])
+
+    def test_invalid_cursor(self):
+        """A cursor that isn't ours is not found."""
+        for cursor in ('garbage', 'WzEsIDJd', 'bm90IGpzb24'):
+            response = self.client.get(reverse('polls:index'),
+                                       {'cursor': cursor})
+            self.assertEqual(response.status_code, 404)
+
+    def test_json_api(self):
+        """The questions API pages with the same cursors."""
+        pages = self.walk(reverse('polls:questions_json'),
+                          lambda page: page.json()['next'], page_size=4)
+        self.assertEqual(
+            [item['id'] for page in pages for item in page.json()['results']],
+            [question.id for question in self.expected])
+        self.assertIsNone(pages[0].json()['previous'])
+
+
 class QuestionDetailViewTests(TestCase):
     """This class contains test for Detail view and behavior."""
 
@@ -259,12 +572,47 @@ class QuestionDetailViewTests(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 302)
 
+    def test_selected_choice_matched_by_id(self):
+        """Only the voted choice is checked, even among equal texts."""
+        question = create_question(
+            question_text='Past Question.', days=-5, end_in=10)
+        question.choice_set.create(choice_text='same')
+        voted = question.choice_set.create(choice_text='same')
+        cast_vote(self.user, question, voted.id)
+        response = self.client.get(
+            reverse('polls:detail', args=(question.id,)))
+        self.assertContains(response, 'checked', 1)
+        self.assertContains(response, 'id="selected" value="%s"' % voted.id)
+
+    def test_query_count_is_fixed(self):
+        """Detail renders in the same few queries for any poll size.
+
+        Session, user, question, choices and the user's vote for a
+        logged-in user, without the session query when sessions are
+        not read from the database; question and choices for anyone
+        else.
+        """
+        logged_in = 5 if settings.SESSION_ENGINE.endswith('.db') else 4
+        question = create_question(
+            question_text='Past Question.', days=-5, end_in=10)
+        url = reverse('polls:detail', args=(question.id,))
+        for number in range(10):
+            question.choice_set.create(choice_text=f'choice {number}')
+            if number == 2:
+                cast_vote(self.user, question, question.choice_set.last().id)
+            with self.assertNumQueries(logged_in):
+                self.client.get(url)
+        self.client.logout()
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
 
 class QuestionResultViewTests(TestCase):
     """This class contains test for Result view and behaviour."""
 
     def setUp(self):
-        """Set up user, question, and choice."""
+        """Set up user, question, and choice with an empty cache."""
+        cache.clear()
         self.user = User.objects.create(
             username="demo", email="demo@email.com")
         self.user.set_password('demopass')
@@ -274,7 +622,7 @@ class QuestionResultViewTests(TestCase):
         self.another_user.set_password('demopass1')
         self.another_user.save()
         self.active_question = create_question(
-            question_text='Some interesting question.', days=-2)
+            question_text='Some interesting question.', days=-2, end_in=5)
         self.active_question.save()
 
     def test_vote_count_display_correctly(self):
@@ -283,12 +631,31 @@ class QuestionResultViewTests(TestCase):
         self.client.login(username='demo1', password='demopass1')
         choice = self.active_question.choice_set.create(
             choice_text="5/5")
-        Vote.objects.create(choice=choice, user=self.user)
-        Vote.objects.create(choice=choice, user=self.another_user)
+        Vote.objects.create(choice=choice, user=self.user,
+                            question=self.active_question)
+        Vote.objects.create(choice=choice, user=self.another_user,
+                            question=self.active_question)
+        rebuild_vote_counts()
+        choice.refresh_from_db()
+        self.assertEqual(choice.votes, 2)
         url = reverse("polls:results",
                       args=(self.active_question.id,))
         response = self.client.get(url)
-        self.assertContains(response, choice.votes)
+        self.assertContains(response, f"<td> {choice.votes} </td>")
+
+    def test_query_count_is_flat(self):
+        """Rendering results costs the same queries for any number of choices."""
+        url = reverse("polls:results", args=(self.active_question.id,))
+        for total in (3, 300):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.active_question.choice_set.all().delete()
+            self.active_question.choice_set.bulk_create([
+                Choice(question=self.active_question,
+                       choice_text=f"choice {number}", vote_count=number)
+                for number in range(total)])
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertContains(response, f"choice {total - 1}")
 
     def test_future_question(self):
         """Result view of unpublished question return 404."""
@@ -299,11 +666,13 @@ class QuestionResultViewTests(TestCase):
         self.assertEqual(response.status_code, 404)
 
 
+@override_settings(POLLS_VOTE_LIMITER=False)
 class VoteViewTest(TestCase):
     """This class contain test for Vote model and behaviour."""
 
     def setUp(self):
         """Set up user, question and choice."""
+        ratelimit._limiter = None
         self.user = User.objects.create(
             username="demo", email="demo@email.com")
         self.user.set_password('demopass')
@@ -370,3 +739,1293 @@ class VoteViewTest(TestCase):
             choice__in=self.active_question.choice_set.all()).first()
         # check the second time selected choice.
         self.assertEqual(vote_object2.choice, self.choice2)
+
+
+@override_settings(POLLS_VOTE_LIMITER=False)
+class SessionModeTest(TestCase):
+    """This class contains test for sessions and messages on votes."""
+
+    def setUp(self):
+        """Set up user, question and choice."""
+        ratelimit._limiter = None
+        self.user = User.objects.create(username="demo")
+        self.question = create_question(
+            question_text='Some interesting question.', days=-2, end_in=5)
+        self.choice = self.question.choice_set.create(choice_text="one")
+
+    def vote_and_read_results(self):
+        """Vote, follow the redirect and return the session queries."""
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('polls:vote', args=(self.question.id,)),
+                {'choice': self.choice.id}, follow=True)
+        self.assertContains(response, 'Congratulation! Vote taken.')
+        return [query['sql'] for query in queries
+                if 'django_session' in query['sql']]
+
+    def test_default_mode_writes_no_session(self):
+        """A vote only reads the session, its message goes in a cookie."""
+        session_queries = self.vote_and_read_results()
+        self.assertTrue(all(sql.startswith('SELECT')
+                            for sql in session_queries))
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies',
+        MESSAGE_STORAGE='django.contrib.messages.storage.cookie.'
+                        'CookieStorage')
+    def test_signed_cookies_mode_skips_session_table(self):
+        """The low-overhead mode doesn't touch the session table."""
+        self.assertEqual(self.vote_and_read_results(), [])
+
+
+class SQLitePragmaTest(TestCase):
+    """This class contains test for the SQLite production profile."""
+
+    def pragma(self, name):
+        """Return the current value of a pragma of the connection."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(
+        POLLS_SQLITE_PRAGMAS={'cache_size': -1234, 'busy_timeout': 4321})
+    def test_pragmas_run_on_new_connection(self):
+        """Every pragma of the profile is set on the connection."""
+        signals.apply_sqlite_pragmas(sender=None, connection=connection)
+        self.assertEqual(self.pragma('cache_size'), -1234)
+        self.assertEqual(self.pragma('busy_timeout'), 4321)
+
+    @override_settings(POLLS_SQLITE_PRAGMAS={})
+    def test_default_profile_leaves_connection(self):
+        """Without a profile the connection keeps SQLite's defaults."""
+        before = self.pragma('cache_size')
+        with CaptureQueriesContext(connection) as queries:
+            signals.apply_sqlite_pragmas(sender=None, connection=connection)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(self.pragma('cache_size'), before)
+
+    def test_production_profile_settings(self):
+        """The production pragmas turn on WAL and a busy timeout."""
+        pragmas = settings.POLLS_SQLITE_PRODUCTION_PRAGMAS
+        self.assertEqual(pragmas['journal_mode'], 'WAL')
+        self.assertGreater(pragmas['busy_timeout'], 0)
+
+
+@override_settings(POLLS_VOTE_LIMITER=False, POLLS_VOTE_BUFFER=False)
+class DatabaseProfileBenchmarkTest(TransactionTestCase):
+    """This class contains test for concurrent voters on both profiles."""
+
+    def test_no_vote_fails(self):
+        """Concurrent voters on a SQLite file never get a lock error."""
+        out = StringIO()
+        call_command('bench_db_profile', votes=80, threads=8, users=10,
+                     questions=2, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(results['default']['errors'], 0)
+        self.assertEqual(results['production']['errors'], 0)
+
+
+class ExplainQueriesTest(TransactionTestCase):
+    """This class contains test for the query plan audit."""
+
+    def test_full_scan_pattern(self):
+        """Only whole table scans of SQLite and PostgreSQL plans match."""
+        plans = {
+            'SCAN polls_vote': ['polls_vote'],
+            'SCAN polls_question USING INDEX polls_quest_pub_dat_idx': [],
+            'SCAN polls_choice USING COVERING INDEX polls_choice_idx': [],
+            'SEARCH polls_vote USING INDEX polls_vote_user_idx (user_id=?)':
+                [],
+            'Seq Scan on polls_vote  (cost=0.00..35.50 rows=2550)':
+                ['polls_vote'],
+            'Index Scan using polls_question_pkey on polls_question': [],
+        }
+        for plan, tables in plans.items():
+            with self.subTest(plan=plan):
+                self.assertEqual(
+                    [match.group('sqlite') or match.group('postgres')
+                     for match in FULL_SCAN.finditer(plan)], tables)
+
+    def test_view_queries_use_indexes(self):
+        """The view queries of a small seeded dataset scan no table."""
+        out = StringIO()
+        call_command('explain_queries', questions=50, users=10, votes=200,
+                     stdout=out)
+        self.assertIn('No full table scans.', out.getvalue())
+
+
+@override_settings(POLLS_RESULTS_CACHE=False)
+class ResultSnapshotTest(TestCase):
+    """This class contains test for the frozen results of closed polls."""
+
+    def setUp(self):
+        """Set up a closed question with one vote."""
+        self.user = User.objects.create(username="demo")
+        self.question = create_question(
+            question_text='Some interesting question.', days=-5, end_in=2)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+        cast_vote(self.user, self.question, self.choice1.id)
+        self.url = reverse('polls:results', args=(self.question.id,))
+
+    def test_first_read_freezes(self):
+        """Results of a closed poll come from its snapshot in one query."""
+        self.client.get(self.url)
+        snapshot = ResultSnapshot.objects.get(question=self.question)
+        self.assertEqual(snapshot.tallies, [
+            [self.choice1.id, 'one', 1], [self.choice2.id, 'two', 0]])
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['choices'][0]['votes'], 1)
+
+    def test_changed_choice_refreezes(self):
+        """Editing a choice of a closed poll makes a new snapshot."""
+        self.client.get(self.url)
+        self.choice2.choice_text = 'deux'
+        self.choice2.save()
+        response = self.client.get(
+            reverse('polls:results_json', args=(self.question.id,)))
+        self.assertEqual(response.json()['choices'][1]['choice_text'],
+                         'deux')
+        snapshot = ResultSnapshot.objects.get(question=self.question)
+        self.assertEqual(snapshot.tallies[1][1], 'deux')
+
+    def test_open_question_not_frozen(self):
+        """Open polls keep reading their live counters."""
+        self.question.end_date = timezone.now() + datetime.timedelta(days=1)
+        self.question.save()
+        self.client.get(self.url)
+        self.assertFalse(ResultSnapshot.objects.exists())
+
+    def test_refreeze_and_archive(self):
+        """Archived votes are moved to a file and the counts kept."""
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('refreeze_polls', archive=directory,
+                         stdout=StringIO())
+            path = Path(directory) / f'votes-{self.question.id}.jsonl.gz'
+            lines = gzip.decompress(path.read_bytes()).decode().splitlines()
+        self.assertEqual(json.loads(lines[0]), {
+            'user_id': self.user.id, 'question_id': self.question.id,
+            'choice_id': self.choice1.id})
+        self.assertFalse(Vote.objects.exists())
+        self.assertTrue(ResultSnapshot.objects.get(
+            question=self.question).votes_archived)
+        rebuild_vote_counts()
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+
+
+@override_settings(POLLS_VOTE_LIMITER=False)
+class VoteCounterTest(TestCase):
+    """This class contains test for the stored vote counters."""
+
+    def setUp(self):
+        """Set up user, question and choices."""
+        ratelimit._limiter = None
+        self.user = User.objects.create(
+            username="demo", email="demo@email.com")
+        self.user.set_password('demopass')
+        self.user.save()
+        self.question = create_question(
+            question_text='Some interesting question.', days=-2)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+        self.url = reverse('polls:vote', args=(self.question.id,))
+
+    def assert_counts(self, first, second):
+        """Check the stored counters of both choices and the question."""
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual(self.choice1.votes, first)
+        self.assertEqual(self.choice2.votes, second)
+        self.assertEqual(self.question.vote_count, first + second)
+
+    def test_new_vote_increments_counters(self):
+        """Casting a vote increments the choice and question counters."""
+        self.client.login(username='demo', password='demopass')
+        self.client.post(self.url, {'choice': self.choice1.id})
+        self.assert_counts(1, 0)
+
+    def test_moved_vote_moves_counter(self):
+        """Changing a vote moves one count to the new choice."""
+        self.client.login(username='demo', password='demopass')
+        self.client.post(self.url, {'choice': self.choice1.id})
+        self.client.post(self.url, {'choice': self.choice2.id})
+        self.assert_counts(0, 1)
+        self.client.post(self.url, {'choice': self.choice2.id})
+        self.assert_counts(0, 1)
+
+    def test_rebuild_vote_counts(self):
+        """Counters can be rebuilt from the Vote rows."""
+        Vote.objects.create(user=self.user, question=self.question,
+                            choice=self.choice2)
+        self.assert_counts(0, 0)
+        self.assertEqual(rebuild_vote_counts(), 1)
+        self.assert_counts(0, 1)
+
+    def test_deleted_voter_is_uncounted(self):
+        """Deleting a voter takes their vote off the counters."""
+        other = User.objects.create(username="other")
+        cast_vote(self.user, self.question, self.choice1.id)
+        cast_vote(other, self.question, self.choice2.id)
+        version = Question.objects.get(pk=self.question.pk).tally_version
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.user.delete()
+        self.assertTrue(callbacks)
+        self.assert_counts(0, 1)
+        self.assertGreater(self.question.tally_version, version)
+
+    def test_deleted_choice_is_uncounted(self):
+        """Deleting a choice takes its votes off the question counter."""
+        cast_vote(self.user, self.question, self.choice1.id)
+        cast_vote(User.objects.create(username="other"), self.question,
+                  self.choice2.id)
+        self.choice1.delete()
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.vote_count, 1)
+
+
+@override_settings(POLLS_RESULTS_CACHE=True, POLLS_VOTE_LIMITER=False)
+class ResultsCacheTest(TestCase):
+    """This class contains test for the cached results tallies."""
+
+    def setUp(self):
+        """Set up user, question and choices with an empty cache."""
+        ratelimit._limiter = None
+        cache.clear()
+        self.user = User.objects.create(
+            username="demo", email="demo@email.com")
+        self.user.set_password('demopass')
+        self.user.save()
+        self.question = create_question(
+            question_text='Some interesting question.', days=-2, end_in=5)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+        self.url = reverse('polls:results', args=(self.question.id,))
+
+    def test_second_read_hits_cache(self):
+        """Results are counted once and then served from the cache."""
+        before = cache_stats()
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        after = cache_stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+    def test_vote_invalidates_cache(self):
+        """A vote expires the cached tallies of its question."""
+        get_tallies(self.question.id)
+        self.client.login(username='demo', password='demopass')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('polls:vote', args=(self.question.id,)),
+                {'choice': self.choice2.id})
+        tallies = get_tallies(self.question.id)
+        self.assertEqual([row['votes'] for row in tallies], [0, 1])
+
+    def test_vote_invalidates_cache_on_commit(self):
+        """Tallies cached before a vote commits are dropped once it does."""
+        get_tallies(self.question.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            cast_vote(self.user, self.question, self.choice2.id)
+            before = cache_stats()
+            get_tallies(self.question.id)
+            self.assertEqual(cache_stats()['hits'] - before['hits'], 1)
+        for callback in callbacks:
+            callback()
+        tallies = get_tallies(self.question.id)
+        self.assertEqual([row['votes'] for row in tallies], [0, 1])
+
+    def test_choice_edit_invalidates_cache(self):
+        """Editing a choice expires the cached tallies of its question."""
+        get_tallies(self.question.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.choice1.choice_text = "renamed"
+            self.choice1.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, "renamed")
+
+    @override_settings(POLLS_RESULTS_CACHE=False)
+    def test_cache_can_be_turned_off(self):
+        """With the cache off, every read counts from the database."""
+        before = cache_stats()
+        for _ in range(2):
+            with self.assertNumQueries(2):
+                self.client.get(self.url)
+        self.assertEqual(cache_stats(), before)
+
+
+@override_settings(POLLS_VOTE_BUFFER=True, POLLS_VOTE_BUFFER_INTERVAL=3600,
+                   POLLS_VOTE_LIMITER=False)
+class VoteBufferTest(TestCase):
+    """This class contains test for the write-behind vote buffer."""
+
+    def setUp(self):
+        """Set up user, question, choices and an empty buffer."""
+        ratelimit._limiter = None
+        caches['votes'].clear()
+        buffer._buffer = None
+        self.user = User.objects.create(
+            username="demo", email="demo@email.com")
+        self.user.set_password('demopass')
+        self.user.save()
+        self.question = create_question(
+            question_text='Some interesting question.', days=-2)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+        self.url = reverse('polls:vote', args=(self.question.id,))
+        self.client.login(username='demo', password='demopass')
+
+    def tearDown(self):
+        """Stop the background flusher of the buffer."""
+        if buffer._buffer is not None:
+            buffer._buffer.stop()
+        buffer._buffer = None
+
+    def test_vote_is_queued_until_flush(self):
+        """A buffered vote is written by the next flush."""
+        response = self.client.post(self.url, {'choice': self.choice1.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Vote.objects.count(), 0)
+        self.assertEqual(buffer.get_vote_buffer().pending(), 1)
+        self.assertEqual(buffer.get_vote_buffer().flush(), 1)
+        self.assertEqual(buffer.get_vote_buffer().pending(), 0)
+        vote = Vote.objects.get()
+        self.assertEqual(vote.choice, self.choice1)
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+
+    def test_last_write_wins(self):
+        """Only the latest queued choice of a user is written."""
+        self.client.post(self.url, {'choice': self.choice1.id})
+        self.client.post(self.url, {'choice': self.choice2.id})
+        buffer.get_vote_buffer().flush()
+        self.assertEqual(Vote.objects.get().choice, self.choice2)
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.vote_count, 1)
+
+    def test_flush_moves_existing_vote(self):
+        """A queued vote replaces the user's stored vote."""
+        buffer.write_votes(
+            {(self.user.id, self.question.id): self.choice1.id})
+        self.client.post(self.url, {'choice': self.choice2.id})
+        call_command('flush_votes', stdout=StringIO())
+        self.assertEqual(Vote.objects.get().choice, self.choice2)
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual((self.choice1.votes, self.choice2.votes), (0, 1))
+
+    def test_changed_vote_is_updated(self):
+        """Queueing a change of a stored vote reports it as updated."""
+        response = self.client.post(
+            self.url, {'choice': self.choice1.id}, follow=True)
+        self.assertContains(response, 'Congratulation! Vote taken.')
+        buffer.get_vote_buffer().flush()
+        response = self.client.post(
+            self.url, {'choice': self.choice2.id}, follow=True)
+        self.assertContains(response, 'Congratulation! Vote Updated.')
+
+    async def test_async_changed_vote_is_updated(self):
+        """The async view reports a queued change as updated too."""
+        await sync_to_async(cast_vote)(
+            self.user, self.question, self.choice1.id)
+        await sync_to_async(self.async_client.force_login)(self.user)
+        with use_async_views():
+            response = await self.async_client.post(
+                self.url, {'choice': self.choice2.id})
+            response = await self.async_client.get(response.url)
+        self.assertContains(response, 'Congratulation! Vote Updated.')
+        self.assertEqual(
+            await sync_to_async(buffer.get_vote_buffer().pending)(), 1)
+
+    def test_unwritable_vote_is_dropped(self):
+        """A vote whose choice was deleted doesn't block the others."""
+        other = User.objects.create(username="other")
+        queue = buffer.get_vote_buffer()
+        queue.push(self.user.id, self.question.id, self.choice1.id)
+        queue.push(other.id, self.question.id, self.choice2.id)
+        queue.push(other.id + 1, self.question.id, self.choice1.id)
+        self.choice2.delete()
+        with self.assertLogs('polls.buffer', 'WARNING') as logs:
+            self.assertEqual(queue.flush(), 1)
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(queue.pending(), 0)
+        self.assertEqual(Vote.objects.get().choice, self.choice1)
+
+
+@override_settings(POLLS_VOTE_LIMITER=True, POLLS_VOTE_DEDUP_SECONDS=5.0,
+                   POLLS_VOTE_RATE=1.0, POLLS_VOTE_BURST=5,
+                   POLLS_VOTE_LIMITER_CACHE='')
+class VoteLimiterTest(TestCase):
+    """This class contains test for the vote rate limiter."""
+
+    def setUp(self):
+        """Set up user, question, choices and a fresh limiter."""
+        ratelimit._limiter = None
+        self.user = User.objects.create(username="demo")
+        self.question = create_question(
+            question_text='Some interesting question.', days=-2, end_in=5)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+        self.url = reverse('polls:vote', args=(self.question.id,))
+        self.client.force_login(self.user)
+
+    def test_double_submit_is_collapsed(self):
+        """A repeated submission succeeds without touching the polls."""
+        self.client.post(self.url, {'choice': self.choice1.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                self.url, {'choice': self.choice1.id}, follow=True)
+        self.assertContains(response, 'Congratulation! Vote Updated.')
+        self.assertEqual(Vote.objects.get().choice, self.choice1)
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+        self.assertFalse([query for query in queries
+                          if 'polls_vote' in query['sql']])
+
+    def test_changed_choice_goes_through(self):
+        """Moving the vote to another choice is not a duplicate."""
+        self.client.post(self.url, {'choice': self.choice1.id})
+        self.client.post(self.url, {'choice': self.choice2.id})
+        self.assertEqual(Vote.objects.get().choice, self.choice2)
+
+    def test_returning_to_a_choice_goes_through(self):
+        """Only the last submitted choice is collapsed."""
+        for choice in (self.choice1, self.choice2, self.choice1):
+            self.client.post(self.url, {'choice': choice.id})
+        self.assertEqual(Vote.objects.get().choice, self.choice1)
+
+    @override_settings(POLLS_VOTE_BUFFER=True)
+    def test_vote_error_can_be_retried(self):
+        """A submission whose vote raised is not collapsed on retry."""
+        with mock.patch.object(buffer.VoteBuffer, 'push',
+                               side_effect=[OperationalError, None]) as push:
+            with self.assertRaises(OperationalError):
+                self.client.post(self.url, {'choice': self.choice1.id})
+            self.client.post(self.url, {'choice': self.choice1.id})
+        self.assertEqual(push.call_count, 2)
+
+    def test_failed_vote_can_be_retried(self):
+        """A submission that failed is not collapsed on retry."""
+        deleted = self.choice2.id
+        self.choice2.delete()
+        self.client.post(self.url, {'choice': deleted})
+        response = self.client.post(self.url, {'choice': deleted})
+        self.assertEqual(response.context['error_message'],
+                         "You didn't select a choice.")
+
+    @override_settings(POLLS_VOTE_BURST=1, POLLS_VOTE_DEDUP_SECONDS=0)
+    def test_fast_voter_is_throttled(self):
+        """Votes beyond the burst are refused until a token is back."""
+        self.client.post(self.url, {'choice': self.choice1.id})
+        response = self.client.post(self.url, {'choice': self.choice2.id})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(Vote.objects.get().choice, self.choice1)
+
+    def test_token_bucket_refills(self):
+        """A bucket gives a burst, then one token per 1 / rate seconds."""
+        now = [0.0]
+        limiter = ratelimit.VoteLimiter(
+            ratelimit.MemoryBackend(clock=lambda: now[0]),
+            window=0, rate=2.0, burst=2)
+        self.assertIsNone(limiter.check(1, 1, '1'))
+        self.assertIsNone(limiter.check(1, 1, '2'))
+        self.assertEqual(limiter.check(1, 1, '3'), (False, 1))
+        self.assertIsNone(limiter.check(2, 1, '1'))
+        now[0] = 0.5
+        self.assertIsNone(limiter.check(1, 1, '3'))
+
+    def test_cache_backend(self):
+        """The shared backend collapses and throttles like the local one."""
+        cache.clear()
+        limiter = ratelimit.VoteLimiter(
+            ratelimit.CacheBackend('default'), window=5, rate=1, burst=1)
+        self.assertIsNone(limiter.check(1, 1, '1'))
+        self.assertEqual(limiter.check(1, 1, '1'), (True, 0))
+        self.assertEqual(limiter.check(1, 1, '2'), (False, 1))
+        # a throttled submission is checked again instead of collapsed
+        self.assertEqual(limiter.check(1, 1, '2'), (False, 1))
+
+
+class VoteUpsertTest(TestCase):
+    """This class contains test for one vote per user per question."""
+
+    def setUp(self):
+        """Set up user, question and choices."""
+        self.user = User.objects.create(
+            username="demo", email="demo@email.com")
+        self.user.set_password('demopass')
+        self.user.save()
+        self.question = create_question(
+            question_text='Some interesting question.', days=-2)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+
+    def test_database_rejects_second_vote(self):
+        """A user can't have two votes on the same question."""
+        Vote.objects.create(user=self.user, question=self.question,
+                            choice=self.choice1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(user=self.user, question=self.question,
+                                choice=self.choice2)
+
+    def test_cast_vote_returns_previous_choice(self):
+        """Casting a vote reports the choice it replaced."""
+        self.assertIsNone(cast_vote(self.user, self.question, self.choice1.id))
+        self.assertEqual(
+            cast_vote(self.user, self.question, self.choice2.id),
+            self.choice1.id)
+        self.assertEqual(Vote.objects.get().choice, self.choice2)
+
+    def test_moving_vote_queries(self):
+        """A moved vote costs a rejected insert, a lookup and an update."""
+        cast_vote(self.user, self.question, self.choice1.id)
+        with CaptureQueriesContext(connection) as queries:
+            cast_vote(self.user, self.question, self.choice2.id)
+        statements = [query['sql'].split()[0] for query in queries
+                      if 'SAVEPOINT' not in query['sql']]
+        # rejected insert, lookup, vote update, question version and the
+        # choice counters
+        self.assertEqual(statements, ['INSERT', 'SELECT'] + ['UPDATE'] * 4)
+
+
+class ConcurrentVoteTest(TransactionTestCase):
+    """This class contains test for votes submitted at the same time."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Use a SQLite file, whose connections wait for each other.
+
+        The shared in-memory test database reports lock contention at
+        once, where a file waits for the busy timeout like production.
+        """
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        cls.enterClassContext(isolated_database(
+            os.path.join(directory.name, 'concurrent.sqlite3')))
+        super().setUpClass()
+
+    def setUp(self):
+        """Set up user, question and choices."""
+        self.user = User.objects.create(username="demo")
+        self.question = create_question(
+            question_text='Some interesting question.', days=-2)
+        self.choices = [
+            self.question.choice_set.create(choice_text=str(number))
+            for number in range(4)]
+
+    def vote_in_thread(self, choice, barrier, errors):
+        """Cast a vote from its own database connection."""
+        try:
+            barrier.wait()
+            cast_vote(self.user, self.question, choice.id)
+        except Exception as error:  # pragma: no cover
+            errors.append(error)
+        finally:
+            connection.close()
+
+    def test_concurrent_votes_keep_one_vote(self):
+        """Simultaneous submissions of one user leave one counted vote."""
+        barrier = threading.Barrier(8)
+        errors = []
+        threads = [
+            threading.Thread(target=self.vote_in_thread,
+                             args=(self.choices[number % 4], barrier, errors))
+            for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(Vote.objects.count(), 1)
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.vote_count, 1)
+        counts = Choice.objects.filter(
+            question=self.question).values_list('vote_count', flat=True)
+        self.assertEqual(sorted(counts), [0, 0, 0, 1])
+
+
+@override_settings(POLLS_VOTE_LIMITER=False)
+class AsyncViewsTest(TestCase):
+    """This class contains test for the async views served under ASGI."""
+
+    def setUp(self):
+        """Route to async views and set up user, question and choices."""
+        ratelimit._limiter = None
+        routing = use_async_views()
+        routing.__enter__()
+        self.addCleanup(routing.__exit__, None, None, None)
+        cache.clear()
+        self.user = User.objects.create(
+            username="demo", email="demo@email.com")
+        self.question = create_question(
+            question_text='Some interesting question.', days=-2, end_in=5)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+
+    async def test_anonymous_vote_redirects_to_login(self):
+        """Log-in is required before voting."""
+        response = await self.async_client.post(
+            reverse('polls:vote', args=(self.question.id,)),
+            {'choice': self.choice1.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('login'), response.url)
+
+    async def test_vote_then_change_vote(self):
+        """An async vote is stored once and can be moved."""
+        await sync_to_async(self.async_client.force_login)(self.user)
+        url = reverse('polls:vote', args=(self.question.id,))
+        await self.async_client.post(url, {'choice': self.choice1.id})
+        await self.async_client.post(url, {'choice': self.choice2.id})
+        vote = await Vote.objects.aget(user=self.user)
+        self.assertEqual(vote.choice_id, self.choice2.id)
+        await self.choice2.arefresh_from_db()
+        self.assertEqual(self.choice2.votes, 1)
+
+    @override_settings(POLLS_VOTE_LIMITER=True)
+    async def test_limiter_runs_off_the_event_loop(self):
+        """The sync limiter backends don't block the event loop."""
+        await sync_to_async(self.async_client.force_login)(self.user)
+        loop_thread = threading.current_thread()
+        threads = []
+
+        def record(limiter, *args):
+            threads.append(threading.current_thread())
+
+        with mock.patch.object(ratelimit.VoteLimiter, 'check', autospec=True,
+                               side_effect=record), \
+                mock.patch.object(ratelimit.VoteLimiter, 'forget',
+                                  autospec=True, side_effect=record):
+            response = await self.async_client.post(
+                reverse('polls:vote', args=(self.question.id,)),
+                {'choice': 'none'})
+        self.assertEqual(response.context['error_message'],
+                         "You didn't select a choice.")
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(loop_thread, threads)
+
+    async def test_detail_shows_selected_choice(self):
+        """Detail page marks the choice the user voted for."""
+        await sync_to_async(self.async_client.force_login)(self.user)
+        await Vote.objects.acreate(
+            user=self.user, question=self.question, choice=self.choice2)
+        response = await self.async_client.get(
+            reverse('polls:detail', args=(self.question.id,)))
+        self.assertContains(response, 'id="selected" value="%s"'
+                            % self.choice2.id)
+
+    async def test_results_show_tallies(self):
+        """Results page lists choices and 404s for future questions."""
+        response = await self.async_client.get(
+            reverse('polls:results', args=(self.question.id,)))
+        self.assertContains(response, "two")
+        future_question = await sync_to_async(create_question)(
+            question_text='Future question.', days=5)
+        response = await self.async_client.get(
+            reverse('polls:results', args=(future_question.id,)))
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkLoaderTest(TestCase):
+    """This class contains test for the streaming fixture loader."""
+
+    fixtures_dir = Path(__file__).resolve().parent.parent / 'data'
+
+    def test_stream_matches_json_load(self):
+        """Reading in tiny chunks yields the same objects as json.load."""
+        path = self.fixtures_dir / 'polls.json'
+        with open(path, encoding='utf-8') as stream:
+            streamed = list(iter_json_array(stream, chunk_size=7))
+        with open(path, encoding='utf-8') as stream:
+            self.assertEqual(streamed, json.load(stream))
+
+    def test_truncated_fixture_is_rejected(self):
+        """A fixture cut in the middle of an object raises an error."""
+        with self.assertRaises(ValueError):
+            list(iter_json_array(StringIO('[{"model": "polls.question"'),
+                                 chunk_size=4))
+
+    def test_load_sample_data_with_new_pks(self):
+        """Sample data loads with remapped keys and counted votes."""
+        loader = BulkLoader(batch_size=3)
+        for name in ('users.json', 'polls.json'):
+            for item in iter_fixture(self.fixtures_dir / name):
+                loader.add(item)
+        counts = loader.finish()
+        self.assertEqual(counts, {'auth.User': 3, 'polls.Question': 4,
+                                  'polls.Choice': 19, 'polls.Vote': 8})
+        question = Question.objects.get(
+            question_text__startswith='How many hours of sleep')
+        votes = Vote.objects.filter(question=question)
+        self.assertEqual(question.vote_count, votes.count())
+        for vote in votes:
+            self.assertEqual(vote.choice.question, question)
+        self.assertTrue(User.objects.get(username='tan').check_password(
+            'tan4668'))
+
+    def test_loaded_parent_keeps_batch_pending(self):
+        """Pointing to a loaded parent does not flush its model's batch."""
+        loader = BulkLoader()
+        now = timezone.now().isoformat()
+        for pk in (1, 2):
+            loader.add({'model': 'polls.question', 'pk': pk, 'fields': {
+                'question_text': f'Question {pk}?', 'pub_date': now}})
+            loader.add({'model': 'polls.choice', 'pk': pk, 'fields': {
+                'question': 1, 'choice_text': f'Choice {pk}'}})
+        self.assertEqual(len(loader.pending[Question]), 1)
+        self.assertEqual(loader.finish()['polls.Choice'], 2)
+
+    def test_unresolved_foreign_key_is_rejected(self):
+        """New pks need every object pointed to in the fixtures."""
+        with self.assertRaisesMessage(CommandError, 'auth.User'):
+            call_command('bulk_loaddata', self.fixtures_dir / 'polls.json',
+                         stdout=StringIO())
+        self.assertFalse(Question.objects.exists())
+        self.assertFalse(Choice.objects.exists())
+        self.assertFalse(Vote.objects.exists())
+
+
+class ExportTest(TestCase):
+    """This class contains test for the streaming vote export."""
+
+    def setUp(self):
+        """Set up a staff user, a question, choices and a vote."""
+        self.staff = User.objects.create(username="staff", is_staff=True)
+        self.question = create_question(
+            question_text='Some interesting question.', days=-2)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+        cast_vote(self.staff, self.question, self.choice2.id)
+
+    def get_export(self, name, **params):
+        """Return the streamed body of an export as bytes."""
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            reverse('polls:export', args=name.split('.')), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_export_requires_staff(self):
+        """Anonymous users are sent to the admin login."""
+        response = self.client.get(
+            reverse('polls:export', args=('votes', 'csv')))
+        self.assertEqual(response.status_code, 302)
+
+    def test_tallies_csv(self):
+        """Tallies list every choice with its vote count."""
+        lines = self.get_export('tallies.csv').decode().splitlines()
+        self.assertEqual(
+            lines[0], 'question_id,question_text,choice_id,choice_text,votes')
+        self.assertEqual(lines[2], f'{self.question.id},Some interesting '
+                                   f'question.,{self.choice2.id},two,1')
+
+    def test_votes_jsonl_gzip(self):
+        """Gzipped JSONL export decompresses to one vote per line."""
+        body = gzip.decompress(self.get_export('votes.jsonl', gzip=1))
+        self.assertEqual(
+            [json.loads(line) for line in body.splitlines()],
+            [{'user_id': self.staff.id, 'question_id': self.question.id,
+              'choice_id': self.choice2.id}])
+
+    def test_streamed_under_wsgi(self):
+        """The sync handler gets the export as a sync iterator."""
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            reverse('polls:export', args=('votes', 'csv')))
+        self.assertFalse(response.is_async)
+        self.assertEqual(len(list(response.streaming_content)), 2)
+
+    async def test_streamed_under_asgi(self):
+        """The ASGI handler gets the export as an async iterator."""
+        await sync_to_async(self.async_client.force_login)(self.staff)
+        response = await self.async_client.get(
+            reverse('polls:export', args=('votes', 'csv')))
+        self.assertTrue(response.is_async)
+        lines = [line async for line in response.streaming_content]
+        self.assertEqual(
+            lines[1].decode().strip(),
+            f'{self.staff.id},{self.question.id},{self.choice2.id}')
+
+    def test_unknown_export(self):
+        """Unknown export kinds are not found."""
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            reverse('polls:export', args=('users', 'csv')))
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_command(self):
+        """The command writes the same export to a file."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'votes.csv.gz')
+            call_command('export_polls', 'votes', '--gzip', output=path)
+            with gzip.open(path, 'rt') as export:
+                self.assertEqual(export.read().splitlines()[1],
+                                 f'{self.staff.id},{self.question.id},'
+                                 f'{self.choice2.id}')
+
+
+class ResultsJsonTest(TestCase):
+    """This class contains test for the JSON results API."""
+
+    def setUp(self):
+        """Set up user, question and choices with an empty cache."""
+        cache.clear()
+        self.user = User.objects.create(username="demo")
+        self.question = create_question(
+            question_text='Some interesting question.', days=-2)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+        self.url = reverse('polls:results_json', args=(self.question.id,))
+
+    def test_counts_and_etag(self):
+        """The API returns per-choice counts with an ETag."""
+        cast_vote(self.user, self.question, self.choice2.id)
+        response = self.client.get(self.url)
+        self.assertTrue(response.has_header('ETag'))
+        data = response.json()
+        self.assertEqual(data['total'], 1)
+        self.assertEqual([choice['votes'] for choice in data['choices']],
+                         [0, 1])
+
+    def test_unchanged_poll_is_not_modified(self):
+        """A matching If-None-Match costs one query and returns 304."""
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_vote_changes_etag(self):
+        """Casting or moving a vote gives the poll a new ETag."""
+        first = self.client.get(self.url)['ETag']
+        cast_vote(self.user, self.question, self.choice1.id)
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first)
+        self.assertEqual(second.status_code, 200)
+        cast_vote(self.user, self.question, self.choice2.id)
+        third = self.client.get(self.url, HTTP_IF_NONE_MATCH=second['ETag'])
+        self.assertEqual(third.status_code, 200)
+        self.assertEqual(third.json()['choices'][1]['votes'], 1)
+
+    def test_admin_save_keeps_counters(self):
+        """Saving a loaded question or choice doesn't reset its counters."""
+        stale_question = Question.objects.get(pk=self.question.pk)
+        stale_choice = Choice.objects.get(pk=self.choice1.pk)
+        cast_vote(self.user, self.question, self.choice1.id)
+        etag = self.client.get(self.url)['ETag']
+        stale_choice.choice_text = 'renamed'
+        stale_choice.save()
+        stale_question.save()
+        self.question.refresh_from_db()
+        self.choice1.refresh_from_db()
+        self.assertEqual((self.question.vote_count, self.choice1.votes),
+                         (1, 1))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['choices'][0]['choice_text'],
+                         'renamed')
+
+    def test_future_question(self):
+        """Unpublished questions are not found."""
+        future_question = create_question(
+            question_text='Future question.', days=5)
+        response = self.client.get(
+            reverse('polls:results_json', args=(future_question.id,)))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(POLLS_LIVE_RESULTS_INTERVAL=0)
+class LiveResultsTest(TestCase):
+    """This class contains test for the live results stream."""
+
+    def setUp(self):
+        """Set up user, question and choices with an empty cache."""
+        cache.clear()
+        self.user = User.objects.create(username="demo")
+        self.question = create_question(
+            question_text='Some interesting question.', days=-2, end_in=5)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+        self.url = reverse('polls:results_live', args=(self.question.id,))
+
+    def vote(self, choice):
+        """Cast a vote and run what waits for its commit."""
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(self.user, self.question, choice.id)
+
+    @staticmethod
+    def parse(event):
+        """Return the name and data of one Server-Sent Event."""
+        name, data = event.strip().split('\n')
+        return name[len('event: '):], json.loads(data[len('data: '):])
+
+    async def test_event_stream(self):
+        """Live results are served as an uncached event stream."""
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+    async def test_snapshot_then_deltas(self):
+        """Viewers get every tally first, then only what changed."""
+        events = live_results(self.question.id)
+        name, data = self.parse(await anext(events))
+        self.assertEqual(name, 'tallies')
+        self.assertEqual(data, {str(self.choice1.id): 0,
+                                str(self.choice2.id): 0})
+        await sync_to_async(self.vote)(self.choice2)
+        name, data = self.parse(await anext(events))
+        self.assertEqual((name, data), ('delta', {str(self.choice2.id): 1}))
+        await sync_to_async(self.vote)(self.choice1)
+        name, data = self.parse(await anext(events))
+        self.assertEqual(data, {str(self.choice1.id): 1,
+                                str(self.choice2.id): 0})
+        await events.aclose()
+        self.assertFalse(broker.watching(self.question.id))
+
+    async def test_viewers_share_tallies(self):
+        """Only the first viewer of a question reads the tallies."""
+        first = await broker.subscribe(self.question.id)
+        self.addCleanup(broker.unsubscribe, first)
+        with mock.patch('polls.events.aget_tallies') as aget_tallies:
+            second = await broker.subscribe(self.question.id)
+        self.addCleanup(broker.unsubscribe, second)
+        aget_tallies.assert_not_called()
+        broker.publish(self.question.id, {self.choice1.id: 2})
+        broker.publish(self.question.id, {self.choice1.id: -1})
+        await second.changed.wait()
+        self.assertEqual(await broker.tallies(self.question.id),
+                         {self.choice1.id: 1, self.choice2.id: 0})
+
+    def test_wsgi_is_not_served(self):
+        """Streams are not opened on WSGI workers."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 501)
+
+    async def test_future_question(self):
+        """Unpublished questions are not found."""
+        future_question = await sync_to_async(create_question)(
+            question_text='Future question.', days=5)
+        response = await self.async_client.get(
+            reverse('polls:results_live', args=(future_question.id,)))
+        self.assertEqual(response.status_code, 404)
+
+
+class BenchmarkTest(TestCase):
+    """This class contains test for the benchmark helpers."""
+
+    def setUp(self):
+        """Set up a published question."""
+        self.question = create_question(
+            question_text='Some interesting question.', days=-2, end_in=5)
+
+    def test_measure_counts_queries_and_statuses(self):
+        """Each run reports queries per request and status codes."""
+        urls = [reverse('polls:results', args=(self.question.id,)),
+                reverse('polls:results', args=(self.question.id + 1,))]
+        summary = measure(
+            lambda number: self.client.get(urls[number % 2]), 4)
+        self.assertEqual(summary['requests'], 4)
+        self.assertEqual(summary['statuses'], {'200': 2, '404': 2})
+        self.assertGreaterEqual(summary['max_queries'], 1)
+
+    def test_compare_runs(self):
+        """Slower paths and extra queries are reported as regressions."""
+        path = {'per_second': 100.0, 'p95_ms': 10.0, 'queries': 2.0}
+        baseline = {'paths': {'index': path, 'vote': path}}
+        current = {'paths': {
+            'index': dict(path, per_second=95.0, p95_ms=10.5),
+            'vote': dict(path, per_second=50.0, queries=3.0),
+            'signup': path}}
+        regressions = compare_runs(baseline, current, tolerance=0.1)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(message.startswith('vote:')
+                            for message in regressions))
+
+
+class SignupTest(TestCase):
+    """This class contains test for the signup page."""
+
+    def test_signup_logs_in(self):
+        """A new user is created, logged in and sent to the polls."""
+        response = self.client.post(reverse('signup'), {
+            'username': 'newcomer', 'password1': 'Signup-pass-65',
+            'password2': 'Signup-pass-65'})
+        self.assertRedirects(response, reverse('polls:index'))
+        self.assertEqual(int(self.client.session['_auth_user_id']),
+                         User.objects.get(username='newcomer').pk)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ProvisionUsersTest(TestCase):
+    """This class contains test for the bulk user provisioning."""
+
+    def setUp(self):
+        """Write a roster with a taken and a repeated username."""
+        User.objects.create(username="taken")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.roster = Path(directory.name) / 'roster.csv'
+        self.roster.write_text(
+            'username,password,email,is_staff\n'
+            'student1,secret1,one@ku.th,\n'
+            'taken,secret2,,\n'
+            'student2,secret3,,true\n'
+            'student1,again,,\n', encoding='utf-8')
+
+    def provision(self, workers):
+        """Run the command and return its output."""
+        out = StringIO()
+        call_command('provision_users', str(self.roster),
+                     workers=workers, batch_size=1, stdout=out)
+        return out.getvalue()
+
+    def test_creates_new_users(self):
+        """New usernames are created with hashed passwords, others skipped."""
+        output = self.provision(workers=0)
+        self.assertIn('Created 2 user(s), skipped 2', output)
+        student = User.objects.get(username='student1')
+        self.assertTrue(student.check_password('secret1'))
+        self.assertEqual(student.email, 'one@ku.th')
+        self.assertTrue(User.objects.get(username='student2').is_staff)
+
+    def test_process_pool(self):
+        """Passwords hashed by worker processes are usable."""
+        self.provision(workers=2)
+        self.assertTrue(User.objects.get(
+            username='student2').check_password('secret3'))
+
+    def test_hashed_passwords_are_kept(self):
+        """Rosters dumped from the database keep their password hashes."""
+        encoded = make_password('kept')
+        hashed = hash_passwords([encoded, ''])
+        self.assertEqual(hashed[0], encoded)
+        self.assertFalse(is_password_usable(hashed[1]))
+
+
+@override_settings(POLLS_QUERY_INSTRUMENTATION=True,
+                   POLLS_QUERY_REPEAT_THRESHOLD=3)
+class QueryInstrumentationTest(TestCase):
+    """This class contains test for the query instrumentation middleware."""
+
+    def setUp(self):
+        """Set up a published question with choices."""
+        self.question = create_question(
+            question_text='Some interesting question.', days=-2, end_in=5)
+        for text in ('one', 'two', 'three'):
+            self.question.choice_set.create(choice_text=text)
+
+    def test_server_timing_and_log(self):
+        """Requests report their queries in a header and a log line."""
+        with self.assertLogs('polls.queries', 'INFO') as logs:
+            response = self.client.get(
+                reverse('polls:results', args=(self.question.id,)))
+        self.assertRegex(response['Server-Timing'],
+                         r'^db;dur=[\d.]+;desc="\d+ queries"$')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'polls:results')
+        self.assertEqual(record['n_plus_one'], {})
+        self.assertGreaterEqual(record['queries'], 1)
+
+    def test_repeated_statement_is_flagged(self):
+        """A query run once per row is logged as a warning."""
+        def view(request):
+            for choice in self.question.choice_set.all():
+                Vote.objects.filter(choice=choice).count()
+            return HttpResponse()
+
+        middleware = QueryInstrumentationMiddleware(view)
+        with self.assertLogs('polls.queries', 'WARNING') as logs:
+            middleware(RequestFactory().get('/'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(list(record['n_plus_one'].values()), [3])
+        self.assertEqual(record['duplicates'], 2)
+
+    @override_settings(POLLS_QUERY_INSTRUMENTATION=False)
+    def test_disabled(self):
+        """The middleware leaves the chain when instrumentation is off."""
+        with self.assertRaises(MiddlewareNotUsed):
+            QueryInstrumentationMiddleware(HttpResponse)
+        response = self.client.get(reverse('polls:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+@override_settings(POLLS_READ_REPLICAS=['replica'], POLLS_VOTE_LIMITER=False)
+class ReplicaRouterTest(TestCase):
+    """This class contains test for the read-replica router."""
+
+    def setUp(self):
+        """Set up user, question, choice and a spy on the router."""
+        ratelimit._limiter = None
+        cache.clear()
+        self.user = User.objects.create(username="demo")
+        self.question = create_question(
+            question_text='Some interesting question.', days=-2, end_in=5)
+        self.choice = self.question.choice_set.create(choice_text="one")
+        # record the replica each read is routed to, but read the primary
+        self.routed = []
+        patcher = mock.patch.object(
+            ReplicaRouter, 'db_for_read', autospec=True,
+            side_effect=lambda router, model, **hints: self.routed.append(
+                replica_alias.get()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, name):
+        """Get a page of the question and return the replicas read."""
+        self.routed.clear()
+        response = self.client.get(reverse(name, args=(self.question.id,)))
+        self.assertEqual(response.status_code, 200)
+        return set(self.routed)
+
+    def test_read_only_views_use_replica(self):
+        """Results are read from the replica, the vote form is not."""
+        self.assertEqual(self.get('polls:results'), {'replica'})
+        self.assertEqual(self.get('polls:results_json'), {'replica'})
+        self.assertEqual(self.get('polls:detail'), {None})
+
+    async def test_async_export_uses_replica(self):
+        """Export chunks pulled from the event loop read the replica."""
+        self.user.is_staff = True
+        await self.user.asave()
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(
+            reverse('polls:export', args=('tallies', 'csv')))
+        self.routed.clear()
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertIn(b'Some interesting question.', body)
+        self.assertEqual(set(self.routed), {'replica'})
+
+    def test_voter_reads_primary_after_vote(self):
+        """A voter sees their own vote until the replicas catch up."""
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('polls:vote', args=(self.question.id,)),
+            {'choice': self.choice.id})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(self.get('polls:results'), {None})
+        self.client.cookies.pop(STICKY_COOKIE)
+        self.assertEqual(self.get('polls:results'), {'replica'})
+
+    def test_replica_reads_are_not_cached(self):
+        """Tallies read from a lagging replica don't fill the cache."""
+        token = replica_alias.set('replica')
+        try:
+            get_tallies(self.question.id)
+        finally:
+            replica_alias.reset(token)
+        with self.assertNumQueries(1):
+            get_tallies(self.question.id)
+        with self.assertNumQueries(0):
+            get_tallies(self.question.id)
+
+    def test_writes_go_to_primary(self):
+        """Rows read on a replica are saved to the primary."""
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_write(Question), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'polls'))
+
+    def test_sync_unknown_replica(self):
+        """Only configured replicas can be refreshed."""
+        with self.assertRaises(CommandError):
+            call_command('sync_replicas', 'elsewhere', stdout=StringIO())
+
+    @override_settings(POLLS_READ_REPLICAS=[])
+    def test_disabled(self):
+        """Without replicas the middleware leaves the chain."""
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaMiddleware(HttpResponse)
+
+
+@override_settings(POLLS_FRAGMENT_CACHE=True)
+class FragmentCacheTest(TestCase):
+    """This class contains test for the anonymous page fragment cache."""
+
+    def setUp(self):
+        """Set up user, an open question and an empty cache."""
+        cache.clear()
+        self.user = User.objects.create(username="demo")
+        self.question = create_question(
+            question_text='Some interesting question.', days=-2, end_in=5)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+        self.detail_url = reverse('polls:detail', args=(self.question.id,))
+
+    def test_anonymous_hits_skip_the_database(self):
+        """Repeated anonymous pages are rendered without queries."""
+        for url in (reverse('polls:index'), self.detail_url):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertContains(first, 'Some interesting question.')
+            self.assertContains(second, 'Some interesting question.')
+
+    def test_per_request_parts_are_not_cached(self):
+        """Messages and CSRF tokens are rendered on every request."""
+        self.client.get(self.detail_url)
+        fragment = fragments.get_fragment('detail', self.question.id)
+        self.assertNotIn('csrfmiddlewaretoken', fragment)
+        self.client.get(reverse('polls:detail', args=(self.question.id + 9,)))
+        response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, 'No such question.')
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, 'No such question.')
+
+    def test_logged_in_selection_is_not_shared(self):
+        """Users see their own choice, anonymous visitors never do."""
+        self.client.get(self.detail_url)
+        cast_vote(self.user, self.question, self.choice2.id)
+        self.client.force_login(self.user)
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, 'id="selected" value="%s"'
+                            % self.choice2.id)
+        self.client.logout()
+        response = self.client.get(self.detail_url)
+        self.assertNotContains(response, 'checked')
+
+    def test_edits_expire_fragments(self):
+        """Editing a question or a choice shows up on the next request."""
+        self.client.get(reverse('polls:index'))
+        self.client.get(self.detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.question_text = 'Edited question.'
+            self.question.save()
+        self.assertContains(self.client.get(reverse('polls:index')),
+                            'Edited question.')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.choice1.choice_text = 'uno'
+            self.choice1.save()
+        self.assertContains(self.client.get(self.detail_url), 'uno')
+
+    def test_edits_expire_fragments_on_commit(self):
+        """Pages cached before an edit commits are dropped once it does."""
+        self.client.get(reverse('polls:index'))
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.question.question_text = 'Edited question.'
+            self.question.save()
+            self.assertIsNotNone(fragments.get_fragment('index', ''))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(fragments.get_fragment('index', ''))
+
+    def test_fragments_expire_at_next_transition(self):
+        """Fragments are ignored once a question opens or closes."""
+        self.assertEqual(fragments.next_transition(), self.question.end_date)
+        upcoming = create_question(question_text='Soon.', days=1)
+        self.assertEqual(fragments.next_transition(), upcoming.pub_date)
+        self.client.get(reverse('polls:index'))
+        self.assertIsNotNone(fragments.get_fragment('index', ''))
+        later = upcoming.pub_date + datetime.timedelta(seconds=1)
+        with mock.patch('polls.fragments.timezone.now', return_value=later):
+            self.assertIsNone(fragments.get_fragment('index', ''))
+
+    @override_settings(POLLS_FRAGMENT_CACHE=False)
+    def test_disabled(self):
+        """Without the cache mode every page reads the database."""
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('polls:index'))
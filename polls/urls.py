@@ -1,13 +1,29 @@
 """This module contains url patterns for poll app."""
 
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
 
 app_name = 'polls'
+
+if settings.POLLS_ASYNC_VIEWS:
+    detail_view = async_views.AsyncDetailView.as_view()
+    results_view = async_views.AsyncResultsView.as_view()
+    vote_view = async_views.vote
+else:
+    detail_view = views.DetailView.as_view()
+    results_view = views.ResultsView.as_view()
+    vote_view = views.vote
+
 urlpatterns = [
     path('', views.IndexView.as_view(), name='index'),
-    path('<int:pk>/', views.DetailView.as_view(), name='detail'),
-    path('<int:pk>/results/', views.ResultsView.as_view(), name='results'),
-    path('<int:question_id>/vote/', views.vote, name='vote'),
+    path('questions.json', views.questions_json, name='questions_json'),
+    path('<int:pk>/', detail_view, name='detail'),
+    path('<int:pk>/results/', results_view, name='results'),
+    path('<int:pk>/results.json', views.results_json, name='results_json'),
+    path('<int:pk>/results/live/', async_views.results_stream,
+         name='results_live'),
+    path('<int:question_id>/vote/', vote_view, name='vote'),
+    path('export/<slug:kind>.<slug:fmt>', views.export, name='export'),
 ]
@@ -1,13 +1,31 @@
 """This module contains models for view."""
 
-from django.http import HttpResponseRedirect, Http404
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    HttpResponseRedirect, Http404, JsonResponse, StreamingHttpResponse)
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404, render
+from django.template.loader import render_to_string
 from django.urls import reverse
 from django.views import generic
+from django.views.decorators.http import condition, require_safe
 from django.utils import timezone
+from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
 from django.contrib import messages
+from . import fragments
+from .buffer import get_vote_buffer
+from .export import EXPORTS, FORMATS, encode, export_lines, stream_async
 from .models import Choice, Question, Vote
+from .pagination import InvalidCursor, KeysetPaginator, page_url
+from .ratelimit import get_vote_limiter
+from .tallies import cast_vote, closed_tallies, get_tallies
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 
 
 class IndexView(generic.ListView):
@@ -16,11 +34,78 @@ class IndexView(generic.ListView):
     template_name = 'polls/index.html'
     context_object_name = 'latest_question_list'
 
+    def get(self, request, *args, **kwargs):
+        """Serve anonymous visitors the cached question list if any."""
+        if fragments.enabled(request):
+            html = fragments.get_fragment('index', self.fragment_query())
+            if html is not None:
+                return render(request, self.template_name,
+                              {'question_list_html': mark_safe(html)})
+        return super().get(request, *args, **kwargs)
+
+    def fragment_query(self):
+        """Return the query string the question list depends on."""
+        return urlencode(sorted(self.request.GET.items()))
+
     def get_queryset(self):
-        """Return the last five published questions."""
-        return Question.objects.filter(
-            pub_date__lte=timezone.localtime()
-        ).order_by('-pub_date')[:5]
+        """Return the questions with their voting state.
+
+        The state is computed in the query against one ``now``, which
+        ``paginate_queryset`` also keeps the published questions at.
+        """
+        self.now = timezone.now()
+        return Question.objects.with_status(self.now)
+
+    def get_paginate_by(self, queryset):
+        """Return the default number of questions per page."""
+        return settings.POLLS_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, page_size):
+        """Return the keyset page the ``cursor`` parameter points to."""
+        paginator, page = question_page(
+            self.request, queryset,
+            [Question.objects.published_filter(self.now)], page_size)
+        return paginator, page, page.object_list, \
+            page.has_next() or page.has_previous()
+
+    def get_context_data(self, **kwargs):
+        """Add the links to the newer and older pages."""
+        context = super().get_context_data(**kwargs)
+        page = context['page_obj']
+        context['newer_url'] = page_url(self.request, page.previous_cursor)
+        context['older_url'] = page_url(self.request, page.next_cursor)
+        if fragments.enabled(self.request):
+            html = render_to_string(
+                'polls/_question_list.html', context, self.request)
+            fragments.set_fragment(
+                'index', (self.fragment_query(),), html,
+                fragments.next_transition())
+            context['question_list_html'] = html
+        return context
+
+
+def question_page(request, queryset, conditions, page_size=None):
+    """Return the paginator and page of questions a request asks for.
+
+    :param request: request with optional ``cursor`` and ``page_size``
+        parameters.
+    :param queryset: questions to paginate.
+    :param conditions: Q objects the questions must match, filtered on
+        after the cursor.
+    :param page_size: default page size.
+
+    :returns: ``(paginator, page)`` pair.
+    :raises Http404: if the cursor is invalid.
+    """
+    paginator = KeysetPaginator(
+        queryset, per_page=page_size or settings.POLLS_PAGE_SIZE,
+        max_per_page=settings.POLLS_MAX_PAGE_SIZE, conditions=conditions)
+    try:
+        page = paginator.page(request.GET.get('cursor'),
+                              request.GET.get('page_size'))
+    except InvalidCursor:
+        raise Http404('Invalid page cursor.')
+    return paginator, page
 
 
 class DetailView(generic.DetailView):
@@ -30,44 +115,54 @@ class DetailView(generic.DetailView):
     template_name = 'polls/detail.html'
 
     def get_queryset(self):
-        """Excludes any questions that aren't published yet."""
-        return Question.objects.filter(pub_date__lte=timezone.localtime())
+        """Return questions with their voting state and choices.
+
+        Unpublished and closed questions are kept so ``get`` can tell
+        the visitor why they can't vote on them.
+        """
+        return Question.objects.with_status().prefetch_related(
+            Prefetch('choice_set', queryset=Choice.objects.order_by('pk')))
 
     def get(self, request, *args, **kwargs):
         """Redirect to pages according to the status of question."""
-        user = request.user
-        self.question = None
+        if fragments.enabled(request):
+            html = fragments.get_fragment('detail', kwargs['pk'])
+            if html is not None:
+                return render(request, 'polls/detail.html',
+                              {'question': Question(pk=kwargs['pk']),
+                               'choices_html': mark_safe(html)})
         try:
-            self.question = get_object_or_404(Question, pk=kwargs['pk'])
+            self.object = self.get_object()
         except Http404:
             messages.error(request, 'No such question.')
             return HttpResponseRedirect(reverse('polls:index'))
         # If someone navigates to a poll detail page
         # when voting is not allowed,
         # redirect them to the polls index page
-        else:
-            if not self.question.is_published():
-                messages.error(
-                    request, 'That given question is not published yet.')
-                return HttpResponseRedirect(reverse('polls:index'))
-            if not self.question.can_vote():
-                messages.error(request, 'This question is closed.')
-                return HttpResponseRedirect(
-                    reverse('polls:results', args=(self.question.id,)))
-            selected_choice_info = ''
-            if not user.is_anonymous:
-                try:
-                    vote_object = Vote.objects.get(
-                        user=user, choice__in=self.question.choice_set.all())
-                    selected_choice_info = vote_object.choice.choice_text
-                except Vote.DoesNotExist:
-                    selected_choice_info = ''
-                return render(request, 'polls/detail.html',
-                              {'question': self.question,
-                               'check_info': selected_choice_info})
-            return render(request, 'polls/detail.html',
-                          {'question': self.question,
-                           'check_info': selected_choice_info})
+        if self.object.status == Question.Status.UPCOMING:
+            messages.error(
+                request, 'That given question is not published yet.')
+            return HttpResponseRedirect(reverse('polls:index'))
+        if self.object.status == Question.Status.CLOSED:
+            messages.error(request, 'This question is closed.')
+            return HttpResponseRedirect(
+                reverse('polls:results', args=(self.object.id,)))
+        selected_choice_id = None
+        if request.user.is_authenticated:
+            selected_choice_id = Vote.objects.filter(
+                user=request.user, question=self.object
+            ).values_list('choice_id', flat=True).first()
+        context = {'question': self.object,
+                   'choices': self.object.choice_set.all(),
+                   'selected_choice_id': selected_choice_id}
+        if fragments.enabled(request):
+            # anonymous visitors have no selected choice to leak
+            context['choices_html'] = render_to_string(
+                'polls/_choices.html', context, request)
+            fragments.set_fragment(
+                'detail', (self.object.pk,), context['choices_html'],
+                self.object.end_date)
+        return render(request, 'polls/detail.html', context)
 
 
 class ResultsView(generic.DetailView):
@@ -78,37 +173,217 @@ class ResultsView(generic.DetailView):
 
     def get_queryset(self):
         """Excludes any results of questions that aren't published yet."""
-        return Question.objects.filter(pub_date__lte=timezone.localtime())
+        now = timezone.now()
+        return Question.objects.published(now).with_status(
+            now).select_related('snapshot')
+
+    def get_context_data(self, **kwargs):
+        """Add the vote tallies of the question's choices.
+
+        Closed questions are read with their frozen snapshot; others from
+        the results cache, or from one query on the stored counters, so
+        the page renders in at most two queries.
+        """
+        context = super().get_context_data(**kwargs)
+        choices = closed_tallies(self.object)
+        if choices is None:
+            choices = get_tallies(self.object.pk)
+        context['choices'] = choices
+        return context
+
+
+def results_etag(request, pk):
+    """Return the ETag of a published question's tallies.
+
+    It only reads the question's tally version, so unchanged polls are
+    answered with 304 without counting anything.
+    """
+    version = Question.objects.published().filter(
+        pk=pk).values_list('tally_version', flat=True).first()
+    return None if version is None else f'{pk}.{version}'
+
+
+@require_safe
+@condition(etag_func=results_etag)
+def results_json(request, pk):
+    """Return the vote counts of a question's choices as JSON."""
+    now = timezone.now()
+    question = get_object_or_404(Question.objects.published(now).with_status(
+        now).select_related('snapshot'), pk=pk)
+    choices = closed_tallies(question)
+    if choices is None:
+        choices = get_tallies(question.id)
+    response = JsonResponse({
+        'id': question.id,
+        'question_text': question.question_text,
+        'total': question.vote_count,
+        'choices': choices,
+    })
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@require_safe
+def questions_json(request):
+    """Return a page of published questions, newest first, as JSON.
+
+    ``?status=open`` or ``?status=closed`` keeps only questions in that
+    voting state.
+    """
+    now = timezone.now()
+    status = request.GET.get('status')
+    if status == Question.Status.OPEN:
+        condition = Question.objects.open_filter(now)
+    elif status == Question.Status.CLOSED:
+        condition = (Question.objects.published_filter(now)
+                     & Question.objects.closed_filter(now))
+    elif status:
+        return JsonResponse({'error': 'Unknown status.'}, status=400)
+    else:
+        condition = Question.objects.published_filter(now)
+    _, page = question_page(
+        request, Question.objects.with_status(now), [condition])
+    return JsonResponse({
+        'results': [{
+            'id': question.id,
+            'question_text': question.question_text,
+            'pub_date': question.pub_date,
+            'end_date': question.end_date,
+            'status': question.status,
+            'total': question.vote_count,
+        } for question in page],
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    })
 
 
 @login_required
 def vote(request, question_id):
     """Create or update Vote object when vote occurs."""
     user = request.user
-    question = get_object_or_404(Question, pk=question_id)
+    limited, forget = limit_vote(request, user.id, question_id)
+    if limited and limited.duplicate:
+        # what the repeated submission would have shown
+        return voted(request, question_id, created=False)
     try:
-        selected_choice = question.choice_set.get(pk=request.POST['choice'])
-    except (KeyError, Choice.DoesNotExist):
-        # Redirect to the question voting form.
-        return render(request, 'polls/detail.html', {
-            'question': question,
-            'error_message': "You didn't select a choice.",
-        })
-    else:
-        try:
-            vote_object = Vote.objects.get(
-                user=user, choice__in=question.choice_set.all())
-        except Vote.DoesNotExist:
-            # create a new vote object for that question for user
-            new_vote = Vote.objects.create(user=user, choice=selected_choice)
-            new_vote.save()
-            messages.success(
-                request, "Congratulation! Vote taken.",
-                fail_silently=True)
+        selected_choice = None if limited else Choice.objects.select_related(
+            'question').get(pk=request.POST['choice'], question=question_id)
+    except (KeyError, ValueError, Choice.DoesNotExist):
+        selected_choice = None
+    if selected_choice is None:
+        forget()
+        question = get_object_or_404(Question, pk=question_id)
+        return refused(request, question, question.choice_set.all(), limited)
+    with forgotten_on_error(forget):
+        if settings.POLLS_VOTE_BUFFER:
+            created = queue_vote(
+                user.id, selected_choice.question_id, selected_choice.id)
         else:
-            vote_object.choice = selected_choice
-            vote_object.save()
-            messages.success(
-                request, "Congratulation! Vote Updated.",
-                fail_silently=True)
-    return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
+            created = cast_vote(user, selected_choice.question,
+                                selected_choice.id) is None
+    return voted(request, selected_choice.question_id, created)
+
+
+def limit_vote(request, user_id, question_id):
+    """Ask the vote limiter, when it is on, about a vote submission.
+
+    :param request: vote request.
+    :param user_id: id of the voter.
+    :param question_id: id of the question voted on.
+
+    :returns: ``(limited, forget)``, the Limited verdict or None if the
+        vote goes through, and a function to call when the vote is not
+        stored so a retry is not collapsed into it.
+    """
+    posted = request.POST.get('choice')
+    if not settings.POLLS_VOTE_LIMITER or not posted:
+        return None, lambda: None
+    limiter = get_vote_limiter()
+    return (limiter.check(user_id, question_id, posted),
+            partial(limiter.forget, user_id, question_id, posted))
+
+
+def queue_vote(user_id, question_id, choice_id):
+    """Queue a vote, written in the next batch of the write-behind buffer.
+
+    :param user_id: id of the voter.
+    :param question_id: id of the question voted on.
+    :param choice_id: id of the selected choice.
+
+    :returns: True if the user has no stored vote on the question yet. A
+        vote still in the queue is not seen, so changing it before the
+        flush reads as a new vote.
+    """
+    created = not Vote.objects.filter(
+        user=user_id, question=question_id).exists()
+    get_vote_buffer().push(user_id, question_id, choice_id)
+    return created
+
+
+@contextmanager
+def forgotten_on_error(forget):
+    """Forget the vote submission if storing it raises."""
+    try:
+        yield
+    except Exception:
+        # not stored, so a retry must not be collapsed into it
+        forget()
+        raise
+
+
+def voted(request, question_id, created):
+    """Confirm a vote and redirect to the results of its question."""
+    if created:
+        messages.success(
+            request, "Congratulation! Vote taken.", fail_silently=True)
+    else:
+        messages.success(
+            request, "Congratulation! Vote Updated.", fail_silently=True)
+    return HttpResponseRedirect(reverse('polls:results', args=(question_id,)))
+
+
+def refused(request, question, choices, limited):
+    """Show the voting form again to a vote that was not cast.
+
+    :param limited: Limited of a throttled voter, None if no valid
+        choice was posted.
+    """
+    if limited:
+        return throttled(request, question, choices, limited.retry_after)
+    return render(request, 'polls/detail.html', {
+        'question': question,
+        'choices': choices,
+        'error_message': "You didn't select a choice.",
+    })
+
+
+def throttled(request, question, choices, retry_after):
+    """Show the voting form again to a user voting too fast."""
+    response = render(request, 'polls/detail.html', {
+        'question': question,
+        'choices': choices,
+        'error_message': 'Too many votes, please try again in a moment.',
+    }, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+@staff_member_required
+def export(request, kind, fmt):
+    """Stream vote tallies or raw votes as CSV or JSONL, gzipped if asked."""
+    if kind not in EXPORTS or fmt not in FORMATS:
+        raise Http404('No such export.')
+    compress = request.GET.get('gzip') in ('1', 'true')
+    filename = f'{kind}.{fmt}.gz' if compress else f'{kind}.{fmt}'
+    if compress:
+        content_type = 'application/gzip'
+    elif fmt == 'csv':
+        content_type = 'text/csv; charset=utf-8'
+    else:
+        content_type = 'application/jsonl; charset=utf-8'
+    content = encode(export_lines(kind, fmt), compress)
+    if isinstance(request, ASGIRequest):
+        content = stream_async(content)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response